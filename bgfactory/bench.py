@@ -0,0 +1,461 @@
+"""
+Benchmarks of canonical rendering workloads, run them with
+
+    python -m bgfactory.bench                              # run all the workloads and print the results
+    python -m bgfactory.bench --save-baseline bench.json   # store the results as a baseline
+    python -m bgfactory.bench --baseline bench.json        # compare with a baseline, exits with 1 on a regression
+    python -m bgfactory.bench import                       # check that importing bgfactory.ff fits IMPORT_BUDGET
+
+Every workload runs in a fresh process, so that the peak RSS of one workload isn't affected by the others.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+BASELINE_VERSION = 1
+
+# metrics compared with the baseline, higher is worse for all of them
+COMPARED_METRICS = ('wall_time', 'peak_rss')
+
+# seconds for a fresh interpreter to start and import bgfactory.ff
+IMPORT_BUDGET = 0.5
+
+
+def _deck_card(title, text, color):
+    import pangocffi as pango
+    from bgfactory import ff
+
+    # the card of examples/06_preparing_for_print.py
+    dpi = 300
+    pad = 25
+    card = ff.RoundedRectangle(
+        0, 0, ff.mm_to_pixels(63, dpi), ff.mm_to_pixels(88, dpi), radius=ff.mm_to_pixels(3), stroke_width=5,
+        stroke_src=color, fill_src=ff.COLOR_WHITE, padding=(pad, pad, pad, pad),
+        layout=ff.VerticalFlowLayout(halign=ff.HALIGN_CENTER, valign=ff.VALIGN_TOP)
+    )
+
+    card.add(ff.TextUniform(
+        0, 0, card.w * 0.8, ff.INFER, title,
+        font_description=ff.FontDescription(family='Arial', size=card.w * 0.1, weight=pango.Weight.BOLD),
+        halign=ff.HALIGN_CENTER, valign=ff.VALIGN_MIDDLE
+    ))
+    card.add(ff.TextUniform(
+        0, 0, card.w * 0.8, ff.INFER, text,
+        font_description=ff.FontDescription(family='Arial', size=card.w * 0.045, style=pango.Style.OBLIQUE),
+        halign=ff.HALIGN_LEFT, valign=ff.VALIGN_MIDDLE, margin=(0, pad, 0, pad)
+    ))
+
+    panel = ff.Container(
+        0, 0, '100%', ff.FILL, layout=ff.HorizontalFlowLayout(halign=ff.HALIGN_CENTER, valign=ff.VALIGN_MIDDLE))
+    for rotation in (1, 0, 1):
+        panel.add(ff.RegularPolygon(0, 0, card.h * 0.05, num_points=3, rotation=rotation,
+                                    fill_src=ff.COLOR_TRANSPARENT, stroke_src=color))
+    card.add(panel)
+
+    return card
+
+
+def bench_deck(scale):
+    """
+    The deck of examples/06_preparing_for_print.py saved through make_printable_sheets
+    """
+    from bgfactory import ff
+
+    text = ('Warlocks are powerful users of magic. It is ancient and its origins are so old that they were long '
+            'forgotten.\n\nDespite their power, Warlocks are typically cheerful people, armed with an unexpected '
+            'arsenal of dad jokes.')
+
+    cards = [_deck_card(f'Warlock {i}', text, (0.2, 0.3 + 0.05 * (i % 8), 0.7)) for i in range(10 * scale)]
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        ff.make_printable_sheets(cards, dpi=300, out_dir_path=out_dir)
+
+    return len(cards)
+
+
+def _grid_cell_kwargs_plain(i, j):
+    from bgfactory import ff
+
+    return dict(layout=ff.VerticalFlowLayout(ff.HALIGN_CENTER, ff.VALIGN_MIDDLE))
+
+
+def _grid_cell_kwargs_styled(i, j):
+    from bgfactory import ff
+
+    return dict(
+        stroke_width=i,
+        stroke_src=(i * 0.1, j * 0.1, 0.5, 1),
+        fill_src=(0.5, j * 0.1, i * 0.1, 0.7),
+        padding=(i, j, i, j),
+        layout=ff.VerticalFlowLayout(ff.HALIGN_CENTER, ff.VALIGN_MIDDLE)
+    )
+
+
+def grid_variants():
+    """
+    :return: list of the argument lists of grid_component() covering the features of Grid, also used by
+        the Grid regression test
+    """
+    from bgfactory.components.constants import INFER
+
+    return [
+        [400, 400, 0, 0, 0, 0, 1, 0, 0, 0, 0],
+        [400, 400, 1, 1, 0, 0, 1, 0, 0, 0, 0],
+        [400, 400, 2, 2, 0, 0, 1, 0, 0, 0, 0],
+        [400, 400, 3, 3, 0, 0, 1, 0, 0, 0, 0],
+        [INFER, 400, 3, 2, 0, 0, 1, 0, 0, 0, 0],
+        [INFER, INFER, 3, 3, 0, 0, 1, 0, 0, 0, 0],
+        [400, 400, 4, 4, 2, 2, 3, 2, 1, 1, 0],
+        [400, 400, 5, 5, 1, 1, 1, 1, 1, 1, 0],
+        [400, 400, 5, 5, 1, 1, 1, 1, 1, 1, 1],
+        [INFER, INFER, 6, 6, 1, 1, 1, 1, 1, 1, 1],
+    ]
+
+
+def grid_component(w, h, colsid, rowsid, hspaceid, vspaceid, stroke_width, paddingid, merge_right_id, merge_bot_id,
+                   kwargs_gen_id):
+    """
+    :return: a Grid with merged cells and content placed on a background, the ids index the parameter tables
+    """
+    from bgfactory.components.constants import INFER, FILL
+    from bgfactory.components.grid import Grid
+    from bgfactory.components.shape import Rectangle
+
+    merge_right = [
+        [],
+        [(1, 1), (1, 1)],
+    ]
+    merge_bot = [
+        [],
+        [(1, 1), (3, 3)],
+    ]
+    cols_variants = [
+        [80],
+        ['40%'],
+        [FILL],
+        [INFER],
+        [45, '30%', 45, INFER, FILL],
+        [INFER, '10%', '10%', '15%', FILL],
+        [INFER, INFER, INFER, INFER, INFER]
+    ]
+    rows_variants = [
+        [50],
+        ['30%'],
+        [FILL],
+        [INFER],
+        [INFER, 50, '25%', INFER, FILL],
+        ['30%', '30%', INFER, '20%', FILL],
+        [INFER, INFER, INFER, INFER, INFER]
+    ]
+    hspace = [0, 5, [4, 5, 6, 7]]
+    vspace = [0, 5, [6, 7, 8, 9]]
+    padding = [(0, 0, 0, 0), (5, 5, 5, 5), (5, 6, 7, 8)]
+    cell_kwargs_generators = [_grid_cell_kwargs_plain, _grid_cell_kwargs_styled]
+
+    rect = Rectangle(0, 0, 500, 500, stroke_width=0, fill_src=(1, 1, 1, 0.8))
+
+    # the rows are picked by colsid as well, the reference images of the regression test depend on it
+    cols = cols_variants[colsid]
+    rows = rows_variants[colsid]
+
+    grid = Grid(
+        50, 50, w, h, cols, rows, hspace[hspaceid], vspace[vspaceid], stroke_width=stroke_width,
+        padding=padding[paddingid], stroke_src=(0, 0.3, 0.6, 1), fill_src=(0.8, 0.5, 0.0, 0.8),
+        cell_kwargs_generator=cell_kwargs_generators[kwargs_gen_id]
+    )
+    rect.add(grid)
+
+    for i, j in merge_right[merge_right_id]:
+        grid.cell_merge_right(i, j)
+
+    for i, j in merge_bot[merge_bot_id]:
+        grid.cell_merge_down(i, j)
+
+    for i in range(len(rows)):
+        for j in range(len(cols)):
+            content = Rectangle(3, 3, 15 + i * 2, 15 + j * 2, stroke_width=1, stroke_src=(0.9, 0.6, 0.3, 1),
+                                fill_src=(0.3, 0.3, 0.6, 0.7))
+            if grid.cells[i][j]:
+                grid.add(i, j, content)
+
+    return rect
+
+
+def bench_grid_matrix(scale):
+    """
+    The parameter matrix of the Grid regression test
+    """
+    count = 0
+    for _ in range(scale):
+        for args in grid_variants():
+            grid_component(*args).image()
+            count += 1
+
+    return count
+
+
+def bench_markup(scale):
+    """
+    Markup heavy TextMarkup with glyphs replaced by components
+    """
+    from bgfactory import ff
+
+    markup = ('<span font_family="Serif" size="20000" foreground="#ffbb00">Deal 3 &amp; damage</span> to '
+              '<b>every</b> @ in range.\nGain <i>1 &amp;</i> for every <span foreground="#aa3300">@</span> '
+              'defeated this way. Then discard a card &amp; draw two.') * 3
+    replacements = {
+        '&': ff.Circle(0, 0, 10, stroke_width=2, fill_src=(1, 0, 0, 0.5)),
+        '@': ff.Rectangle(0, 0, 30, 20, stroke_width=1, fill_src=(0, 0, 1, 0.5)),
+    }
+
+    count = 40 * scale
+    for i in range(count):
+        card = ff.Rectangle(0, 0, 400, 560, stroke_width=4, padding=(15, 15, 15, 15),
+                            layout=ff.VerticalFlowLayout(ff.HALIGN_CENTER))
+        card.add(ff.TextMarkup(0, 0, '100%', ff.INFER, markup + str(i), text_replace_map=replacements))
+        card.image()
+
+    return count
+
+
+def bench_deep_infer(scale):
+    """
+    Deeply nested containers with sizes inferred from their children
+    """
+    from bgfactory import ff
+
+    depth = 12
+    count = 20 * scale
+    for i in range(count):
+        node = ff.Rectangle(0, 0, 40 + i % 5, 30, stroke_width=1)
+        for level in range(depth):
+            parent = ff.Rectangle(0, 0, ff.INFER, ff.INFER, stroke_width=1, padding=(3, 3, 3, 3),
+                                  layout=ff.VerticalFlowLayout(ff.HALIGN_CENTER))
+            parent.add(node, ff.Rectangle(0, 0, 20, 10, stroke_width=1))
+            node = parent
+        node.image()
+
+    return count
+
+
+def bench_polygon_board(scale):
+    """
+    A big board of hexagons
+    """
+    from bgfactory import ff
+
+    radius = 40
+    # the board grows with scale, so every hexagon is drawn at its own place
+    rows = 25 * scale
+    cols = 25
+    board = ff.Rectangle(0, 0, cols * radius * 2 + radius, rows * radius * 2, stroke_width=0)
+
+    count = 0
+    for i in range(rows):
+        for j in range(cols):
+            board.add(ff.RegularPolygon(
+                j * radius * 2 + (i % 2) * radius, i * radius * 2, radius, num_points=6, stroke_width=3,
+                fill_src=(0.2, 0.3 + 0.02 * (i % 10), 0.5, 1)))
+            count += 1
+
+    board.image()
+
+    return count
+
+
+def bench_import(scale):
+    """
+    Fresh interpreters importing bgfactory.ff and creating a component, i.e. the start of a short script
+    or a worker process
+    """
+    count = 5 * scale
+    for _ in range(count):
+        subprocess.run([sys.executable, '-c', 'from bgfactory import ff; ff.Rectangle(0, 0, 10, 10)'], check=True)
+
+    return count
+
+
+WORKLOADS = {
+    'import': bench_import,
+    'deck': bench_deck,
+    'grid_matrix': bench_grid_matrix,
+    'markup': bench_markup,
+    'deep_infer': bench_deep_infer,
+    'polygon_board': bench_polygon_board,
+}
+
+
+def _peak_rss():
+    """
+    :return: peak resident set size of this process in bytes or None if it can't be measured
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_workload(name, scale=1, repeat=3):
+    """
+    Run the workload in this process
+    :return: dict with the metrics of the workload, wall_time is the best of the repeats
+    """
+    fn = WORKLOADS[name]
+
+    times = []
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = fn(scale)
+        times.append(time.perf_counter() - start)
+
+    wall_time = min(times)
+    return dict(
+        wall_time=wall_time,
+        items=count,
+        items_per_s=count / wall_time if wall_time > 0 else None,
+        peak_rss=_peak_rss(),
+        scale=scale,
+        repeat=repeat,
+    )
+
+
+def run(names=None, scale=1, repeat=3, isolate=True):
+    """
+    :param names: names of the workloads to run, all by default
+    :param scale: multiplies the size of the workloads
+    :param repeat: number of runs of each workload, the fastest one is reported
+    :param isolate: run every workload in a fresh process
+    :return: dict name -> metrics
+    """
+    if names is None:
+        names = list(WORKLOADS)
+
+    for name in names:
+        if name not in WORKLOADS:
+            raise ValueError(f'unknown workload {name}, available: {", ".join(WORKLOADS)}')
+
+    results = {}
+    for name in names:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results[name] = executor.submit(run_workload, name, scale, repeat).result()
+        else:
+            results[name] = run_workload(name, scale, repeat)
+
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    :param results: results of run()
+    :param baseline: results of run() or a loaded baseline file
+    :param threshold: relative increase of a metric that is reported as a regression
+    :return: list of dicts with workload, metric, baseline, current and change of the regressed metrics
+    """
+    baseline = baseline.get('results', baseline)
+
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline or baseline[name].get('scale') != metrics.get('scale'):
+            continue
+
+        for metric in COMPARED_METRICS:
+            old, new = baseline[name].get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+
+            change = new / old - 1
+            if change > threshold:
+                regressions.append(dict(workload=name, metric=metric, baseline=old, current=new, change=change))
+
+    return regressions
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as f:
+        json.dump(dict(
+            version=BASELINE_VERSION, python=platform.python_version(), platform=platform.platform(),
+            results=results
+        ), f, indent=1, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(f'baseline {path} has an unsupported version {baseline.get("version")}')
+
+    return baseline
+
+
+def _format_results(results):
+    lines = []
+    for name, metrics in results.items():
+        peak_rss = metrics['peak_rss']
+        lines.append('{:<16}: {:>9.03f}s, {:>9.02f} items/s, peak RSS {}'.format(
+            name, metrics['wall_time'], metrics['items_per_s'] or 0,
+            '{:.01f}MB'.format(peak_rss / 1024 ** 2) if peak_rss is not None else 'n/a'))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bgfactory.bench', description='Benchmarks of bgfactory')
+    parser.add_argument('workloads', nargs='*', help=f'workloads to run: {", ".join(WORKLOADS)} (default: all)')
+    parser.add_argument('--scale', type=int, default=1, help='multiplies the size of the workloads')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each workload, the fastest one is reported')
+    parser.add_argument('--baseline', help='baseline to compare with, exits with 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative increase of wall time or peak RSS reported as a regression (default: 0.1)')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help=f'seconds allowed for a fresh interpreter to import bgfactory.ff (default: {IMPORT_BUDGET})')
+    parser.add_argument('--save-baseline', help='store the results as a baseline')
+    parser.add_argument('--output', help='store the results as JSON')
+    parser.add_argument('--no-isolate', action='store_true', help='run all the workloads in this process')
+    args = parser.parse_args(argv)
+
+    results = run(args.workloads or None, scale=args.scale, repeat=args.repeat, isolate=not args.no_isolate)
+    print(_format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+
+    failed = False
+
+    if 'import' in results:
+        import_time = results['import']['wall_time'] / results['import']['items']
+        if import_time > args.import_budget:
+            print(f'OVER BUDGET import: {import_time:.03f}s > {args.import_budget:.03f}s')
+            failed = True
+
+    if args.baseline:
+        regressions = compare(results, load_baseline(args.baseline), args.threshold)
+        for regression in regressions:
+            print('REGRESSION {workload} {metric}: {baseline:.04g} -> {current:.04g} ({change:+.01%})'.format(
+                **regression))
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
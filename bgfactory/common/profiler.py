@@ -1,58 +1,219 @@
+import json
+import os
+import threading
 import time
+from functools import wraps
 
 
-class _Profiler:
-    
-    def __init__(self):
-        self.profiles = {}
-        self.current_profile = None
-        self.start = None
-    
-    def __call__(self, *args, **kwargs):
-        
-        if self.current_profile is not None:
-            self.profiles[self.current_profile].append(time.perf_counter() - self.start)
-            self.current_profile = None
-        
+class _NullSection:
+    """
+    Returned by Profiler.section() while the profiler is disabled, does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+
+    __slots__ = ('profiler', 'name', 'args', 'start', 'children')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.children = 0
+        self.profiler._stack().append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        duration = end - self.start
+
+        stack = self.profiler._stack()
+        if stack[-1] is self:
+            stack.pop()
+        else:
+            # closed out of order, only possible with the deprecated flat API
+            stack.remove(self)
+        if stack:
+            stack[-1].children += duration
+
+        self.profiler._record(self.name, self.start, duration, duration - self.children, len(stack), self.args)
+        return False
+
+
+class Profiler:
+    """
+    Hierarchical profiler. Sections can be nested, each thread has its own stack of open sections and
+    the time of a section is reported both in total and without the nested sections (self time).
+    While disabled, the sections cost a single attribute lookup.
+
+        profile.enable()
+
+        with profile.section('load assets'):
+            ...
+
+        @profile.profiled()
+        def build_card(...):
+            ...
+
+        profile.print_summary()
+        profile.save_chrome_trace('trace.json')  # open in chrome://tracing or https://ui.perfetto.dev
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._events = []
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self._events = []
+        self._origin = time.perf_counter_ns()
+
+    def section(self, name, **args):
+        """
+        :param name: name of the section
+        :param args: values attached to the section in the chrome trace
+        :return: context manager measuring the time spent inside it
+        """
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name, args)
+
+    def profiled(self, name=None):
+        """
+        Decorator measuring every call of the function as a section
+        :param name: name of the section, the qualified name of the function by default
+        """
+        def decorator(fn):
+            section_name = fn.__qualname__ if name is None else name
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Section(self, section_name, {}):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def __call__(self, *args):
+        """
+        Deprecated flat API: profile('name') starts a section and ends the previous one started this way,
+        profile() just ends it. Use profile.section() instead.
+        """
+        section = getattr(self._local, 'flat_section', None)
+        if section is not None:
+            self._local.flat_section = None
+            if section is not _NULL_SECTION:
+                section.__exit__(None, None, None)
+
         if args:
-            name = args[0]
-            
-            self.current_profile = name
-            self.start = time.perf_counter()
-            if name not in self.profiles:
-                self.profiles[name] = []
-        
+            section = self.section(args[0])
+            section.__enter__()
+            self._local.flat_section = section
+
+    def summary(self, top=None):
+        """
+        :param top: number of the sections with the most self time to include, all by default
+        :return: list of dicts with name, count, total, self, min, max and avg times in seconds, sorted by self time
+        """
+        stats = {}
+        for name, tid, start, duration, self_duration, depth, args in list(self._events):
+            entry = stats.get(name)
+            if entry is None:
+                entry = stats[name] = dict(name=name, count=0, total=0, self=0, min=duration, max=duration)
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['self'] += self_duration
+            entry['min'] = min(entry['min'], duration)
+            entry['max'] = max(entry['max'], duration)
+
+        rows = sorted(stats.values(), key=lambda entry: entry['self'], reverse=True)
+        if top is not None:
+            rows = rows[:top]
+
+        for row in rows:
+            row['avg'] = row['total'] / row['count']
+            for key in ('total', 'self', 'min', 'max', 'avg'):
+                row[key] /= 1e9
+
+        return rows
+
+    def print_summary(self, top=20):
+        for row in self.summary(top):
+            print('{:<40}: count {:>7}, self {:>10.02f}ms, total {:>10.02f}ms, avg {:>8.02f}ms, max {:>8.02f}ms'.format(
+                row['name'], row['count'], row['self'] * 1000, row['total'] * 1000, row['avg'] * 1000,
+                row['max'] * 1000))
+
     def results(self):
-        
-        # print(self.profiles)
-        
-        for profile in self.profiles:
-            vals = self.profiles[profile]
-            pmin, pmax, pmean, psum = min(vals), max(vals), sum(vals) / len(vals), sum(vals)
-            
-            print('{:<40}: min {:>8.02f}ms, max {:>8.02f}ms, avg {:>8.02f}ms, total {:>8.02f}ms'.format(
-                profile, pmin * 1000, pmax * 1000, pmean * 1000, psum * 1000))
-        
-        
-profile = _Profiler()
+        """
+        Deprecated, use print_summary()
+        """
+        self.print_summary(top=None)
+
+    def chrome_trace(self):
+        """
+        :return: the recorded sections in the Chrome trace event format (also read by Perfetto)
+        """
+        pid = os.getpid()
+        events = []
+        for name, tid, start, duration, self_duration, depth, args in list(self._events):
+            event = dict(name=name, ph='X', ts=(start - self._origin) / 1000, dur=duration / 1000, pid=pid, tid=tid)
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, start, duration, self_duration, depth, args):
+        # list.append is atomic, the threads don't need a lock
+        self._events.append((name, threading.get_ident(), start, duration, self_duration, depth, args))
+
+
+profile = Profiler()
 
 
 if __name__ == '__main__':
-    
-    profile('first profile')
-
-    time.sleep(0.3)
-    
-    profile()
-    
-    profile('first profile')
-    
-    time.sleep(0.1)
-    
-    profile('second profile')
-    
-    time.sleep(0.2)
-    
-    profile()
-    
-    profile.results()
\ No newline at end of file
+
+    profile.enable()
+
+    with profile.section('first profile'):
+        time.sleep(0.3)
+
+        with profile.section('nested profile'):
+            time.sleep(0.1)
+
+    with profile.section('second profile'):
+        time.sleep(0.2)
+
+    profile.print_summary()
@@ -0,0 +1,50 @@
+import os
+
+from bgfactory.components.raster_cache import SurfaceCache
+
+
+def file_version(path):
+    """
+    :return: (mtime_ns, size) of the file, identifying its version, or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class AssetCache(SurfaceCache):
+    """
+    Process-wide LRU cache of decoded images, bounded by the total number of bytes of the cached surfaces.
+    The keys contain the version of the file (see file_version()), so an image that changes on disk is decoded
+    again.
+
+    A card background shared by all the cards of a deck is then decoded once per build instead of once per
+    render, the sources scale it while painting. The sources use the module-level asset_cache, set its max_bytes
+    to 0 to disable it.
+
+        print(asset_cache.stats())
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        :param max_bytes: upper bound on the total size of the cached surfaces
+        """
+        super(AssetCache, self).__init__(max_bytes)
+
+    def get(self, key, create):
+        """
+        :param key: hashable key of the surface, including the version of the file it was created from
+        :param create: function() -> cairo.ImageSurface, called on a miss
+        :return: the cached or the newly created surface
+        """
+        surface = self._lookup(key)
+        if surface is None:
+            # created outside of the lock, decoding of other assets can run meanwhile
+            surface = create()
+            self.put(key, surface)
+        return surface
+
+
+asset_cache = AssetCache()
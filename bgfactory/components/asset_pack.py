@@ -0,0 +1,202 @@
+"""
+Asset packs - a directory of images compiled into a single file of ready-to-paint pixels, see compile_asset_pack()
+and AssetPack. Build the pack once with
+
+    python -m bgfactory.components.asset_pack assets/ assets.pack --levels 2 4
+
+and use PackSource(pack, 'icons/sword.png') instead of PNGSource('assets/icons/sword.png').
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+
+import cairocffi as cairo
+
+from bgfactory.components.asset_cache import file_version
+from bgfactory.components.cairo_helpers import surface_from_image
+
+PACK_MAGIC = b'BGFPACK\0'
+PACK_VERSION = 1
+
+# magic, version, byte order (0 little, 1 big), offset and size of the index
+_HEADER = struct.Struct('<8sIIQQ')
+
+# the pixel blocks start at cache line boundaries, small icons share pages of memory
+_BLOCK_ALIGN = 64
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff')
+
+
+def _align(offset):
+    return -(-offset // _BLOCK_ALIGN) * _BLOCK_ALIGN
+
+
+def compile_asset_pack(src_dir, pack_path, levels=()):
+    """
+    Compile all the images of a directory (recursively) into a pack of premultiplied ARGB32 pixel blocks,
+    the layout of cairo image surfaces, so that they are loaded without decoding.
+    :param src_dir: directory with the images
+    :param pack_path: path of the pack file
+    :param levels: pre-scaled levels stored alongside each image as the divisors of its size, e.g. (2, 4)
+        adds the images at half and quarter size
+    :return: number of the packed images
+    """
+    from PIL import Image
+
+    src_dir = Path(src_dir)
+    paths = sorted(p for p in src_dir.rglob('*') if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+
+    index = {}
+    with open(pack_path, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        offset = _HEADER.size
+
+        for path in paths:
+            with Image.open(path) as image:
+                image = image.convert('RGBA')
+
+            entries = []
+            for divisor in [1] + sorted(set(levels) - {1}):
+                w, h = max(1, image.width // divisor), max(1, image.height // divisor)
+                level = image if divisor == 1 else image.resize((w, h), Image.LANCZOS)
+                surface = surface_from_image(level)
+
+                offset = _align(offset)
+                f.seek(offset)
+                f.write(surface.get_data())
+                entries.append([w, h, surface.get_stride(), offset])
+                offset += surface.get_stride() * h
+
+            index[path.relative_to(src_dir).as_posix()] = entries
+
+        index_data = json.dumps(index).encode()
+        f.seek(offset)
+        f.write(index_data)
+
+        f.seek(0)
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, sys.byteorder == 'big', offset, len(index_data)))
+
+    return len(index)
+
+
+class AssetPack:
+    """
+    Images of a pack compiled by compile_asset_pack(), memory-mapped. The surfaces point straight into the
+    mapped file, nothing is decoded or copied, and the processes using the same pack share its pages.
+
+    The pack is mapped on first use and again after unpickling, so it can be handed to worker processes.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the pack file
+        """
+        self.path = str(path)
+
+        self._mmap = None
+        self._index = None
+        self._surfaces = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __contains__(self, name):
+        return name in self._get_index()
+
+    def __len__(self):
+        return len(self._get_index())
+
+    def names(self):
+        return list(self._get_index())
+
+    def version(self):
+        """
+        :return: version of the pack file, see file_version()
+        """
+        return file_version(self.path)
+
+    def _get_index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._open()
+
+        return self._index
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            # copy-on-write, cairo gets a writable buffer, but the pages stay shared as long as nobody writes
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        magic, version, big_endian, index_offset, index_size = _HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f'{self.path} is not an asset pack of version {PACK_VERSION}')
+        if big_endian != (sys.byteorder == 'big'):
+            raise ValueError(f'{self.path} was compiled on a machine with a different byte order')
+
+        self._mmap = data
+        self._index = json.loads(data[index_offset:index_offset + index_size])
+
+    def get_size(self, name):
+        """
+        :return: (width, height) of the original image
+        """
+        w, h, _, _ = self._get_entries(name)[0]
+        return w, h
+
+    def get(self, name, w_target=None, h_target=None):
+        """
+        :param name: path of the image relative to the compiled directory, with forward slashes
+        :param w_target: width the image will be painted at, None for the original image
+        :param h_target: height the image will be painted at, None for the original image
+        :return: cairo.ImageSurface of the smallest level at least the target size
+        """
+        entries = self._get_entries(name)
+
+        level = 0
+        if w_target is not None and h_target is not None:
+            for i, (w, h, _, _) in enumerate(entries):
+                if w >= w_target and h >= h_target:
+                    level = i
+
+        surface = self._surfaces.get((name, level))
+        if surface is None:
+            w, h, stride, offset = entries[level]
+            data = memoryview(self._mmap)[offset:offset + stride * h]
+            surface = cairo.ImageSurface.create_for_data(data, cairo.FORMAT_ARGB32, w, h, stride)
+            self._surfaces[(name, level)] = surface
+
+        return surface
+
+    def _get_entries(self, name):
+        entries = self._get_index().get(name)
+        if entries is None:
+            raise KeyError(f'{name} is not in the asset pack {self.path}')
+        return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bgfactory.components.asset_pack',
+                                     description='Compile a directory of images into an asset pack')
+    parser.add_argument('src_dir', help='directory with the images')
+    parser.add_argument('pack', help='path of the pack file')
+    parser.add_argument('--levels', type=int, nargs='*', default=[],
+                        help='divisors of the pre-scaled levels stored with each image, e.g. 2 4')
+    args = parser.parse_args(argv)
+
+    n = compile_asset_pack(args.src_dir, args.pack, args.levels)
+    print(f'{n} images, {os.path.getsize(args.pack) / 1024 / 1024:.01f} MB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
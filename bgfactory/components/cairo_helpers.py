@@ -1,24 +1,121 @@
-from PIL import Image
+import sys
+
 import cairocffi as cairo
 
+# numpy and PIL are slow to import and only the pixel export needs them, so they are imported on first use
+
+
+# cairo stores ARGB32 pixels as native-endian 32bit integers, these are the byte offsets of the channels
+if sys.byteorder == 'little':
+    _B, _G, _R, _A = 0, 1, 2, 3
+else:
+    _A, _R, _G, _B = 0, 1, 2, 3
+
+
+def surface_to_array(surface):
+    """
+    View the pixels of a surface as a numpy array without copying them. The view is only valid while
+    the surface is alive, keep a reference to the surface.
+    :param surface: cairo.ImageSurface in FORMAT_ARGB32
+    :return: uint8 array of shape (h, w, 4), channels in the memory order of cairo (BGRA on little-endian machines),
+        colors premultiplied by alpha
+    """
+    import numpy as np
+
+    if surface.get_format() != cairo.FORMAT_ARGB32:
+        raise ValueError('only surfaces in FORMAT_ARGB32 can be exported')
+
+    surface.flush()
+    w, h, stride = surface.get_width(), surface.get_height(), surface.get_stride()
+    return np.ndarray(shape=(h, w, 4), dtype=np.uint8, buffer=surface.get_data(), strides=(stride, 4, 1))
+
+
+def array_from_surface(surface, mode='RGBA'):
+    """
+    Export the pixels of a surface as straight (not premultiplied) colors.
+    :param surface: cairo.ImageSurface in FORMAT_ARGB32
+    :param mode: 'RGBA' or 'RGB', RGB drops the alpha channel
+    :return: new uint8 array of shape (h, w, 4) or (h, w, 3)
+    """
+    import numpy as np
+
+    if mode == 'RGBA':
+        channels = [_R, _G, _B, _A]
+    elif mode == 'RGB':
+        channels = [_R, _G, _B]
+    else:
+        raise ValueError(f'unsupported {mode=}, allowed values: RGBA, RGB')
+
+    pixels = surface_to_array(surface)
+    out = pixels[:, :, channels]
+
+    alpha = pixels[:, :, _A]
+    if alpha.size == 0 or alpha.min() == 255:
+        # opaque pixels are the same premultiplied or not
+        return out
+
+    # c = round(C * a / 255) => C = round(c * 255 / a), fully transparent pixels stay black
+    a = alpha.astype(np.uint32)[:, :, np.newaxis]
+    rgb = out[:, :, :3].astype(np.uint32)
+    rgb = (rgb * 255 + a // 2) // np.maximum(a, 1)
+    out[:, :, :3] = np.minimum(rgb, 255)
 
-def image_from_surface(surface):
-    surface_cropped = cairo.ImageSurface(cairo.FORMAT_ARGB32, surface.get_width(), surface.get_height())
-    cr = cairo.Context(surface_cropped)
-    
-    cr.rectangle(0, 0, surface_cropped.get_width(), surface_cropped.get_height())
-    cr.set_source_surface(surface)
-    cr.set_line_width(0)
-    cr.fill()
-    
-    # print(surface.get_width())
-    # print(surface.get_height())
-    
-    return Image.frombuffer(
-        "RGBA", (surface_cropped.get_width(), surface_cropped.get_height()),
-        surface_cropped.get_data(), "raw", "BGRA", 0, 1)
+    return out
+
+
+def image_from_surface(surface, mode='RGBA'):
+    """
+    Convert a surface into a PIL image with straight (not premultiplied) colors.
+    :param surface: cairo.ImageSurface in FORMAT_ARGB32
+    :param mode: 'RGBA' or 'RGB', RGB drops the alpha channel
+    :return: PIL.Image
+    """
+    from PIL import Image
+
+    return Image.fromarray(array_from_surface(surface, mode))
+
+
+def surface_from_image(image):
+    """
+    Convert a PIL image into a surface, the inverse of image_from_surface(). The colors are premultiplied
+    and written in the channel order of cairo in a single pass over the pixels.
+    :param image: PIL.Image in any mode, it's converted to RGBA
+    :return: cairo.ImageSurface in FORMAT_ARGB32
+    """
+    import numpy as np
+
+    rgba = np.asarray(image.convert('RGBA'))
+    h, w = rgba.shape[:2]
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+    pixels = surface_to_array(surface)
+
+    alpha = rgba[:, :, 3:]
+    if alpha.size == 0 or alpha.min() == 255:
+        # opaque pixels are the same premultiplied or not
+        pixels[:, :, [_R, _G, _B, _A]] = rgba
+    else:
+        # c = round(C * a / 255)
+        premultiplied = (rgba.astype(np.uint16) * alpha + 127) // 255
+        premultiplied[:, :, 3] = alpha[:, :, 0]
+        pixels[:, :, [_R, _G, _B, _A]] = premultiplied
+
+    surface.mark_dirty()
+    return surface
 
 
 def adjust_rect_size_by_line_width(x, y, w, h, line_width):
     hw = line_width / 2
-    return x + hw, y + hw, w - 2 * hw, h - 2 * hw
\ No newline at end of file
+    return x + hw, y + hw, w - 2 * hw, h - 2 * hw
+
+
+def surface_bytes(surface):
+    return surface.get_stride() * surface.get_height()
+
+
+def is_pixel_aligned(cr):
+    """
+    :return: True if the user space of cr maps 1:1 onto whole device pixels (no scaling, rotation or
+    fractional translation), i.e. a surface painted at (0, 0) lands exactly on the device pixels
+    """
+    xx, yx, xy, yy, x0, y0 = cr.get_matrix().as_tuple()
+    return xx == 1 and yy == 1 and xy == 0 and yx == 0 and x0 == int(x0) and y0 == int(y0)
@@ -1,10 +1,24 @@
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import chain, count, islice
 from os import makedirs
-from pathlib import Path
+from pathlib import Path, PurePath
+from traceback import format_exc
+from warnings import warn
 
-from bgfactory.components.constants import COLOR_WHITE, INFER, COLOR_BLACK
+import cairocffi as cairo
+
+from bgfactory.components.cairo_helpers import image_from_surface
+from bgfactory.components.component import Component
+from bgfactory.components.constants import COLOR_WHITE, INFER, COLOR_BLACK, COLOR_RED, HALIGN_CENTER, VALIGN_MIDDLE
+from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
+from bgfactory.components.render_context import render_context
 from bgfactory.components.shape import Rectangle, Line
+from bgfactory.components.shared_asset_cache import SharedAssetCache
 from bgfactory.components.text import TextUniform, FontDescription
-from bgfactory.components.utils import A4_WIDTH_MM, A4_HEIGHT_MM, mm_to_pixels
+from bgfactory.components.utils import A4_WIDTH_MM, A4_HEIGHT_MM, POINTS_PER_INCH, mm_to_pixels, mm_to_points
 
 
 class CardSheet(Rectangle):
@@ -53,6 +67,8 @@ class CardSheet(Rectangle):
                     else:
                         card.x = padx + j * cw
                     card.y = pady + i*ch
+                    # cards are the unit of reuse between builds, see DiskCache
+                    card._disk_cached = True
                     self.add(card)
                     
         if page:
@@ -77,10 +93,208 @@ class CardSheet(Rectangle):
         return self.w, self.h
 
 
-def make_printable_sheets(
-        components, dpi=300, print_margin_hor_mm=5, print_margin_ver_mm=5, page_width_mm=None, page_height_mm=None,
-        overspill_border_mm=1, overspill_border_src=COLOR_BLACK,
-        orientation='auto', cutlines=True, page_numbers=True, out_dir_path=None, out_file_prefix='sheet', out_dir_jpeg_path=None):
+class CardRenderError(Exception):
+    """
+    Report of a card that failed to render in make_printable_sheets
+    """
+
+    def __init__(self, index, card_type, message, traceback):
+        """
+        :param index: index of the card in the rendered components
+        :param card_type: name of the card's class
+        :param message: the error raised while rendering the card
+        :param traceback: formatted traceback of the error
+        """
+        super(CardRenderError, self).__init__(index, card_type, message, traceback)
+        self.index = index
+        self.card_type = card_type
+        self.message = message
+        self.traceback = traceback
+
+    def __str__(self):
+        return f'card {self.index} ({self.card_type}) failed to render: {self.message}'
+
+
+class _RenderedCard(Component):
+    """
+    Card rendered by a worker of make_printable_sheets, paints the rendered pixels
+    """
+
+    def __init__(self, w, h, surface, card_hash):
+        super(_RenderedCard, self).__init__(0, 0, w, h)
+
+        surface.flush()
+        # a single copy of the pixels, the surfaces painted by _draw_contents wrap it
+        self._pixels = bytearray(surface.get_data())
+        self._pixels_format = surface.get_width(), surface.get_height(), surface.get_stride()
+        self._card_hash = card_hash
+
+    def get_size(self):
+        return self.w, self.h
+
+    def _draw_contents(self, cr, w, h):
+        pw, ph, stride = self._pixels_format
+        surface = cairo.ImageSurface.create_for_data(self._pixels, cairo.FORMAT_ARGB32, pw, ph, stride)
+        self._paint_surface(cr, surface)
+
+    def _compute_structural_hash(self):
+        return self._card_hash
+
+
+def _make_error_card(w, h, error):
+    card = Rectangle(0, 0, w, h, stroke_width=6, stroke_src=COLOR_RED, fill_src=COLOR_WHITE,
+                     layout=VerticalFlowLayout(HALIGN_CENTER, VALIGN_MIDDLE))
+    card.add(TextUniform(0, 0, INFER, INFER, f'card {error.index} failed to render', FontDescription(size=min(w, h) / 15),
+                         fill_src=COLOR_RED))
+    return card
+
+
+def _render_card(index, card, render_options):
+    """
+    Render a single card for _render_sheet
+    :param card: the card or the card pickled into bytes
+    :return: _RenderedCard or CardRenderError
+    """
+    card_type = None
+    try:
+        if isinstance(card, bytes):
+            card = pickle.loads(card)
+        card_type = type(card).__name__
+
+        with render_context(**render_options):
+            surface = card.render()
+            return _RenderedCard(card.w, card.h, surface, card.structural_hash())
+    except Exception as e:
+        return CardRenderError(index, card_type, f'{type(e).__name__}: {e}', format_exc())
+
+
+def _save_sheet(sheet, png_path, jpeg_path, render_options):
+    with render_context(**render_options):
+        surface = sheet.render()
+
+    if png_path is not None:
+        image_from_surface(surface).save(png_path)
+    if jpeg_path is not None:
+        image_from_surface(surface, 'RGB').save(jpeg_path, 'JPEG', quality=90, optimize=True)
+
+
+def _render_sheet(index, cards, card_size, sheet_args, paths, render_options, raise_errors):
+    """
+    Worker of make_printable_sheets, runs in the process pool. The cards are rendered one by one so that a failing
+    card doesn't take the whole sheet down, then the sheet is composed from the rendered cards and saved,
+    the pixels never leave the worker.
+    :param index: index of the first card of the sheet in the deck
+    :param cards: the cards of the sheet or the cards pickled into bytes
+    :param card_size: w, h of the cards, the size of the error placeholders
+    :param sheet_args: w, h, page and the options of the CardSheet
+    :param paths: png and jpeg path of the sheet
+    :param raise_errors: when set, the sheet isn't saved if some of its cards failed
+    :return: list of CardRenderError of the cards that failed
+    """
+    rendered = []
+    errors = []
+    for i, card in enumerate(cards):
+        result = _render_card(index + i, card, render_options)
+        if isinstance(result, CardRenderError):
+            errors.append(result)
+            result = _make_error_card(*card_size, result)
+        rendered.append(result)
+
+    if errors and raise_errors:
+        return errors
+
+    w, h, page, sheet_options = sheet_args
+    sheet = CardSheet(w, h, rendered, page=page, **sheet_options)
+    for card in rendered:
+        # the pixels are already at hand, CardSheet marks its cards for the disk cache
+        card._disk_cached = False
+
+    _save_sheet(sheet, *paths, render_options)
+    return errors
+
+
+def _pickle_cards(cards):
+    """
+    :return: list of the cards pickled into bytes or None if some of them can't be pickled
+    """
+    try:
+        return [pickle.dumps(card) for card in cards]
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # e.g. a card holding a lambda
+        return None
+
+
+def _iter_sheets(cards, w, h, components_per_page, page_numbers, **sheet_options):
+    """
+    Lay out the cards onto sheets, one sheet at a time
+    :param cards: iterable of the cards
+    """
+    cards = iter(cards)
+    card0 = None
+
+    for page in count(1):
+        page_cards = list(islice(cards, components_per_page))
+        if not page_cards:
+            return
+
+        # the sheets are planned according to the first card
+        if card0 is None:
+            card0 = page_cards[0]
+        _check_card_sizes(page_cards, card0)
+
+        yield CardSheet(w, h, page_cards, page=page if page_numbers else None, **sheet_options)
+
+
+class _Done:
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+def _make_executor(jobs):
+    if jobs > 1:
+        return ProcessPoolExecutor(max_workers=jobs)
+    return _InlineExecutor()
+
+
+class _InlineExecutor:
+    """
+    Runs the tasks in the calling process, for jobs=1
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def submit(self, fn, *args):
+        return _Done(fn(*args))
+
+
+def _report_errors(errors, on_error, out_dir_path, out_file_prefix):
+    if callable(on_error):
+        for error in errors:
+            on_error(error)
+        return
+
+    for error in errors:
+        warn(str(error))
+
+    if out_dir_path is not None:
+        with open(Path(out_dir_path) / f'{out_file_prefix}_errors.txt', 'w') as f:
+            for error in errors:
+                f.write(f'{error}\n{error.traceback}\n')
+
+
+def _plan_sheets(card, dpi, print_margin_hor_mm, print_margin_ver_mm, page_width_mm, page_height_mm, orientation):
+    """
+    :param card: any of the cards, all of them have the same size
+    :return: w, h of the sheets, the number of cards per sheet and the orientation
+    """
     if page_width_mm is None or page_height_mm is None:
         page_width_mm = A4_WIDTH_MM
         page_height_mm = A4_HEIGHT_MM
@@ -89,10 +303,10 @@ def make_printable_sheets(
     h = mm_to_pixels(page_height_mm - 2 * print_margin_ver_mm, dpi)
 
     if orientation == 'auto':
-        sheet = CardSheet(w, h, components)
+        sheet = CardSheet(w, h, [card])
         n_portrait = sheet.nrows * sheet.ncols
 
-        sheet = CardSheet(h, w, components)
+        sheet = CardSheet(h, w, [card])
         n_landscape = sheet.nrows * sheet.ncols
 
         if n_portrait >= n_landscape:
@@ -107,38 +321,246 @@ def make_printable_sheets(
     else:
         raise ValueError(f'unknown {orientation=}, allowed values: auto, portrait, landscape')
 
-    sheet = CardSheet(w, h, components)
-    components_per_page = sheet.nrows * sheet.ncols
+    sheet = CardSheet(w, h, [card])
+    return w, h, sheet.nrows * sheet.ncols, orientation
 
-    sheets = []
 
-    page = 1
-    for i in range(0, len(components), components_per_page):
-        sheet = CardSheet(
-            w, h, components[i:i + components_per_page],
-            cutlines=cutlines,
-            page=page if page_numbers else None,
-            overspill_border_width=mm_to_pixels(overspill_border_mm, dpi),
-            overspill_border_color=overspill_border_src
-        )
-        page += 1
+def _check_card_sizes(cards, card0):
+    for card in cards:
+        if card.w != card0.w or card.h != card0.h:
+            raise ValueError('all cards must have the same width and height')
 
-        sheets.append(sheet)
 
+def _get_sheet_paths(index, out_dir_path, out_dir_jpeg_path, out_file_prefix):
+    png_path, jpeg_path = None, None
     if out_dir_path is not None:
-        out_dir_path = Path(out_dir_path)
+        png_path = Path(out_dir_path) / f'{out_file_prefix}{index:02d}.png'
+    if out_dir_jpeg_path is not None:
+        jpeg_path = Path(out_dir_jpeg_path) / f'{out_file_prefix}{index:02d}.jpg'
+    return png_path, jpeg_path
 
-        makedirs(out_dir_path, exist_ok=True)
 
-        for index, sheet in enumerate(sheets):
-            sheet.image().save(out_dir_path / f'{out_file_prefix}{index:02d}.png')
+def iter_printable_sheets(
+        components, dpi=300, print_margin_hor_mm=5, print_margin_ver_mm=5, page_width_mm=None, page_height_mm=None,
+        overspill_border_mm=1, overspill_border_src=COLOR_BLACK,
+        orientation='auto', cutlines=True, page_numbers=True, out_dir_path=None, out_file_prefix='sheet', out_dir_jpeg_path=None,
+        disk_cache=None):
+    """
+    Same as make_printable_sheets but the sheets are laid out, rendered and saved one at a time, as they are
+    consumed. Only one sheet is rendered at a time, so the memory doesn't grow with the size of the deck
+    as long as the caller doesn't keep the yielded sheets.
+    
+    :param components: iterable of the cards, can be a generator building them on the fly
+    :return: generator of CardSheet, each is yielded after it was saved
+    """
+    cards = iter(components)
+    try:
+        card0 = next(cards)
+    except StopIteration:
+        return
 
-    if out_dir_jpeg_path is not None:
-        out_dir_jpeg_path = Path(out_dir_jpeg_path)
+    w, h, components_per_page, _ = _plan_sheets(
+        card0, dpi, print_margin_hor_mm, print_margin_ver_mm, page_width_mm, page_height_mm, orientation)
+
+    for out_path in (out_dir_path, out_dir_jpeg_path):
+        if out_path is not None:
+            makedirs(out_path, exist_ok=True)
+
+    render_options = {}
+    if disk_cache is not None:
+        render_options['disk_cache'] = disk_cache
+
+    sheets = _iter_sheets(
+        chain([card0], cards), w, h, components_per_page, page_numbers,
+        cutlines=cutlines,
+        overspill_border_width=mm_to_pixels(overspill_border_mm, dpi),
+        overspill_border_color=overspill_border_src
+    )
+    for index, sheet in enumerate(sheets):
+        png_path, jpeg_path = _get_sheet_paths(index, out_dir_path, out_dir_jpeg_path, out_file_prefix)
+        if png_path is not None or jpeg_path is not None:
+            _save_sheet(sheet, png_path, jpeg_path, render_options)
+
+        yield sheet
+
+
+def make_printable_pdf(
+        components, path, dpi=300, print_margin_hor_mm=5, print_margin_ver_mm=5, page_width_mm=None, page_height_mm=None,
+        overspill_border_mm=1, overspill_border_src=COLOR_BLACK,
+        orientation='auto', cutlines=True, page_numbers=True):
+    """
+    Lay out the components onto sheets the same way as make_printable_sheets and write them as the pages
+    of a vector PDF. The pages are written one at a time, the sheets are not kept in memory.
+
+    The page size and the print margins are in millimetres, the sheets are laid out at dpi and scaled onto
+    the pages, so dpi only sets the resolution of the bitmaps (PNGSource etc.) and of the components
+    that are rendered offscreen. Bitmaps are decoded once for the whole document, the same bitmap
+    used on many cards is embedded into the PDF only once.
+    
+    :param components: iterable of the cards, all of them must have the same size
+    :param path: path of the PDF file or a writable file object
+    :return: number of pages
+    """
+    if page_width_mm is None or page_height_mm is None:
+        page_width_mm = A4_WIDTH_MM
+        page_height_mm = A4_HEIGHT_MM
+
+    cards = iter(components)
+    try:
+        card0 = next(cards)
+    except StopIteration:
+        raise ValueError('there are no components to print')
+
+    w, h, components_per_page, orientation = _plan_sheets(
+        card0, dpi, print_margin_hor_mm, print_margin_ver_mm, page_width_mm, page_height_mm, orientation)
+
+    if orientation == 'landscape':
+        page_width_mm, page_height_mm = page_height_mm, page_width_mm
+        print_margin_hor_mm, print_margin_ver_mm = print_margin_ver_mm, print_margin_hor_mm
+
+    if isinstance(path, PurePath):
+        path = str(path)
+
+    surface = cairo.PDFSurface(path, mm_to_points(page_width_mm), mm_to_points(page_height_mm))
+    cr = cairo.Context(surface)
+
+    sheets = _iter_sheets(
+        chain([card0], cards), w, h, components_per_page, page_numbers,
+        cutlines=cutlines,
+        overspill_border_width=mm_to_pixels(overspill_border_mm, dpi),
+        overspill_border_color=overspill_border_src
+    )
+
+    pages = 0
+    # a single render for the whole document, the decoded bitmaps are shared by all the pages
+    with render_context():
+        for sheet in sheets:
+            cr.save()
+            cr.translate(mm_to_points(print_margin_hor_mm), mm_to_points(print_margin_ver_mm))
+            cr.scale(POINTS_PER_INCH / dpi, POINTS_PER_INCH / dpi)
+            sheet.draw_into(cr, 0, 0, sheet.w, sheet.h)
+            cr.restore()
+
+            cr.show_page()
+            pages += 1
+
+    surface.finish()
+    return pages
+
+
+def make_printable_sheets(
+        components, dpi=300, print_margin_hor_mm=5, print_margin_ver_mm=5, page_width_mm=None, page_height_mm=None,
+        overspill_border_mm=1, overspill_border_src=COLOR_BLACK,
+        orientation='auto', cutlines=True, page_numbers=True, out_dir_path=None, out_file_prefix='sheet', out_dir_jpeg_path=None,
+        disk_cache=None, jobs=1, on_error='raise', shared_assets=False):
+    """
+    Lay out the components onto printable sheets and optionally save them as png/jpeg files.
+    Use iter_printable_sheets for large decks, it keeps only one sheet in memory at a time.
+    
+    :param components: iterable of the cards, all of them must have the same size
+    :param disk_cache: DiskCache, when set the saved sheets and the cards on them that didn't change since
+        a previous build are loaded from the cache instead of being rendered again
+    :param jobs: number of processes rendering and saving the sheets. With jobs > 1 the cards of each sheet are
+        pickled and sent to a worker process which renders and saves the sheet (sheets with cards that can't be
+        pickled are rendered by the calling process), the files are saved the same as with jobs=1.
+        Needs out_dir_path or out_dir_jpeg_path
+    :param on_error: what to do when a card fails to render: 'raise' raises the error, 'report' warns, replaces
+        the card by an error placeholder and writes all reports into {out_file_prefix}_errors.txt in out_dir_path,
+        a callable is called with the CardRenderError and the card is replaced by the placeholder.
+        'report' and a callable need out_dir_path or out_dir_jpeg_path.
+        With 'raise' and jobs=1 the original exception of the card propagates, with jobs > 1 the cards are
+        rendered by the workers and a CardRenderError with the formatted traceback of the card is raised instead
+    :param shared_assets: with jobs > 1, keep the decoded images in shared memory (see SharedAssetCache),
+        the worker processes then map one copy of each image instead of decoding their own
+    :return: list of CardSheet laid out from the components. With jobs > 1 or on_error other than 'raise' they were
+        rendered and saved by the workers, the returned sheets only carry the layout, not the pixels
+    """
+    if on_error not in ('raise', 'report') and not callable(on_error):
+        raise ValueError(f'unknown {on_error=}, allowed values: raise, report or a callable')
+
+    if out_dir_path is None and out_dir_jpeg_path is None:
+        if jobs > 1 or on_error != 'raise':
+            raise ValueError('jobs and on_error need out_dir_path or out_dir_jpeg_path, without them the sheets '
+                             'are only laid out, nothing is rendered')
+
+    if jobs <= 1 and on_error == 'raise':
+        return list(iter_printable_sheets(
+            components, dpi, print_margin_hor_mm, print_margin_ver_mm, page_width_mm, page_height_mm,
+            overspill_border_mm, overspill_border_src, orientation, cutlines, page_numbers, out_dir_path,
+            out_file_prefix, out_dir_jpeg_path, disk_cache))
+
+    cards = iter(components)
+    try:
+        card0 = next(cards)
+    except StopIteration:
+        return []
+
+    w, h, components_per_page, _ = _plan_sheets(
+        card0, dpi, print_margin_hor_mm, print_margin_ver_mm, page_width_mm, page_height_mm, orientation)
+
+    sheet_options = dict(
+        cutlines=cutlines,
+        overspill_border_width=mm_to_pixels(overspill_border_mm, dpi),
+        overspill_border_color=overspill_border_src
+    )
+
+    render_options = {}
+    if disk_cache is not None:
+        render_options['disk_cache'] = disk_cache
+
+    for out_path in (out_dir_path, out_dir_jpeg_path):
+        if out_path is not None:
+            makedirs(out_path, exist_ok=True)
+
+    shared_cache = SharedAssetCache() if shared_assets and jobs > 1 else None
+    if shared_cache is not None:
+        render_options['asset_cache'] = shared_cache
+
+    sheets = []
+    errors = []
+
+    def collect(task):
+        sheet_errors = task.result()
+        if sheet_errors and on_error == 'raise':
+            raise sheet_errors[0]
+        errors.extend(sheet_errors)
+
+    # every sheet is rendered and saved by a worker, only the error reports come back. A couple of sheets are
+    # in flight per worker, so the pickled cards waiting for the workers don't grow with the deck.
+    # The shared images are released after the pool was shut down
+    with shared_cache if shared_cache is not None else nullcontext(), _make_executor(jobs) as executor:
+        pending = deque()
+        deck = chain([card0], cards)
+
+        for index in count():
+            page_cards = list(islice(deck, components_per_page))
+            if not page_cards:
+                break
+            _check_card_sizes(page_cards, card0)
+
+            page = index + 1 if page_numbers else None
+            sheets.append(CardSheet(w, h, page_cards, page=page, **sheet_options))
+
+            first = index * components_per_page
+            sheet_args = (
+                (card0.w, card0.h), (w, h, page, sheet_options),
+                _get_sheet_paths(index, out_dir_path, out_dir_jpeg_path, out_file_prefix), render_options,
+                on_error == 'raise')
+
+            payload = _pickle_cards(page_cards) if jobs > 1 else None
+            if payload is not None:
+                pending.append(executor.submit(_render_sheet, first, payload, *sheet_args))
+            else:
+                # cards that can't be pickled are rendered here
+                pending.append(_Done(_render_sheet(first, page_cards, *sheet_args)))
+
+            while len(pending) > 2 * jobs:
+                collect(pending.popleft())
 
-        makedirs(out_dir_jpeg_path, exist_ok=True)
+        while pending:
+            collect(pending.popleft())
 
-        for index, sheet in enumerate(sheets):
-            sheet.image().convert('RGB').save(out_dir_jpeg_path / f'{out_file_prefix}{index:02d}.jpg', 'JPEG', quality=90, optimize=True)
+    if errors:
+        _report_errors(errors, on_error, out_dir_path, out_file_prefix)
 
     return sheets
@@ -4,16 +4,25 @@ from warnings import warn
 
 import cairocffi as cairo
 
-from bgfactory.components.cairo_helpers import image_from_surface
+from bgfactory.components.cairo_helpers import image_from_surface, is_pixel_aligned
 from bgfactory.components.constants import FILL
 from bgfactory.components.layout.absolute_layout import AbsoluteLayout
+from bgfactory.components.render_context import render_context, get_render_context, invalidate_layout
+from bgfactory.components.render_report import track, add_surface, DRAW, GET_SIZE
+from bgfactory.components.structural_hash import describe_attributes, digest, UnhashableError
 from bgfactory.common.profiler import profile
 
 DEBUG = False
 # DEBUG = True
 
 class Component(ABC):
+
+    # the placement of a component is a part of the structural hash of its parent
+    _hash_exclude = ('x', 'y', 'margin')
     
+    # whether the component is stored in the disk cache of the render when it's drawn by its parent
+    _disk_cached = False
+
     def __init__(self, x, y, w, h, margin=(0, 0, 0, 0)):
         self.x = x
         self.y = y
@@ -21,31 +30,243 @@ class Component(ABC):
         self.h = h
         self.margin = margin
 
-    @abstractmethod
+    def __setattr__(self, name, value):
+        super(Component, self).__setattr__(name, value)
+
+        if not name.startswith('_'):
+            self._invalidate_layout()
+
+    def __getstate__(self):
+        # the memoized sizes are only valid for the render they were measured in
+        state = self.__dict__.copy()
+        state.pop('_measure_cache', None)
+        return state
+
     def draw(self, w, h):
-        profile('cairo.ImageSurface')
+        """
+        Render the component into a new surface of size (w, h).
+
+        Components render through draw_into() which draws directly into a shared cairo context, this is only
+        the entry point for rendering a component on its own. Overriding draw() is still supported,
+        such components are rendered offscreen and painted onto their parent.
+        :param w: width of the surface
+        :param h: height of the surface
+        :return: cairo.ImageSurface
+        """
         surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(ceil(w)), int(ceil(h)))
-        profile()
-        if DEBUG:
+
+        with render_context(), track(self, DRAW):
+            add_surface(surface)
             cr = cairo.Context(surface)
+            self._draw_debug_outline(cr, w, h)
+            self._draw_contents(cr, w, h)
+
+        return surface
+
+    def draw_into(self, cr, x, y, w, h):
+        """
+        Draw the component directly into the context of its parent. The component is placed with its top-left
+        corner at (x, y) in the current user space of cr and it is clipped to (w, h), the same way it would be
+        clipped by a surface of its own.
+        :param cr: cairo.Context to draw into
+        :param x: x coordinate of the component in cr
+        :param y: y coordinate of the component in cr
+        :param w: width of the component
+        :param h: height of the component
+        :return:
+        """
+        with profile.section(type(self).__name__), track(self, DRAW):
+            cr.save()
+            cr.translate(x, y)
+            cr.rectangle(0, 0, int(ceil(w)), int(ceil(h)))
+            cr.clip()
+
+            context = get_render_context()
+            use_cache = context is not None and (
+                context.raster_cache is not None or (context.disk_cache is not None and self._disk_cached))
+            
+            if not (use_cache and self._draw_cached(cr, w, h, context)):
+                self._draw_uncached(cr, w, h)
+
+            cr.restore()
+
+    def _draw_uncached(self, cr, w, h):
+        if type(self).draw is Component.draw:
+            self._draw_debug_outline(cr, w, h)
+            self._draw_contents(cr, w, h)
+        else:
+            # draw() is customized by a subclass, render offscreen so that the customization is respected
+            self._paint_surface(cr, self.draw(w, h))
+
+    def _draw_cached(self, cr, w, h, context):
+        """
+        Paint the component from the caches of the render, rasterizing it into the caches if needed.
+        :return: False if the component has to be drawn normally
+        """
+        if not is_pixel_aligned(cr):
+            return False
+
+        surface = self._get_cached_surface(w, h, context, self._disk_cached)
+        if surface is None:
+            return False
+
+        self._paint_surface(cr, surface)
+        return True
+
+    def _get_cached_surface(self, w, h, context, use_disk_cache):
+        """
+        Look the component up in the raster cache and the disk cache of the render. On a disk cache miss
+        the component is rasterized and stored, the raster cache stores only subtrees that are used often enough.
+        :return: cairo.ImageSurface or None if the component is not cached
+        """
+        structural_hash = self.structural_hash()
+        if structural_hash is None:
+            return None
+
+        key = (structural_hash, int(ceil(w)), int(ceil(h))) + context.pixel_key()
+        raster_cache = context.raster_cache
+        disk_cache = context.disk_cache if use_disk_cache else None
+
+        if raster_cache is not None:
+            surface = raster_cache.get(key)
+            if surface is not None:
+                return surface
+
+        if disk_cache is not None:
+            surface = disk_cache.get(key)
+            if surface is None:
+                surface = self._rasterize(w, h, context)
+                disk_cache.put(key, surface)
+        # don't cache the descendants of a subtree that's being cached, the subtree will be reused as a whole
+        elif raster_cache is not None and context.caching_depth == 0 and raster_cache.should_store(key):
+            surface = self._rasterize(w, h, context)
+        else:
+            return None
+
+        if raster_cache is not None:
+            raster_cache.put(key, surface)
+
+        return surface
+
+    def _rasterize(self, w, h, context):
+        context.caching_depth += 1
+        try:
+            return self.draw(w, h)
+        finally:
+            context.caching_depth -= 1
+
+    def _paint_surface(self, cr, surface):
+        with profile.section('paint child surface'):
+            cr.set_source_surface(surface, 0, 0)
+            cr.paint()
+
+    def _draw_contents(self, cr, w, h):
+        """
+        Override this method to draw the component. The context is already translated to the component's
+        top-left corner and clipped to its area. Leave the context in the state you received it (use save/restore).
+        :param cr: cairo.Context to draw into
+        :param w: width of the component
+        :param h: height of the component
+        :return:
+        """
+        pass
+
+    def _draw_debug_outline(self, cr, w, h):
+        if DEBUG:
+            cr.save()
             cr.rectangle(0, 0, int(ceil(w)), int(ceil(h)))
             cr.set_source_rgba(0.7, 0.3, 0.2, 0.5)
             cr.set_line_width(3)
             cr.stroke()
-        
-        return surface
-    
+            cr.restore()
+
     def image(self):
-        w, h = self.get_size()        
-        return image_from_surface(self.draw(w, h))
-    
+        surface = self.render()
+        with profile.section('export image'):
+            return image_from_surface(surface)
+
+    def render(self):
+        """
+        Render the component at the size it measures, loading it from the disk cache of the render if it's set.
+        :return: cairo.ImageSurface
+        """
+        with render_context() as context:
+            w, h = self.measure()
+
+            surface = None
+            if context.disk_cache is not None:
+                surface = self._get_cached_surface(w, h, context, True)
+            if surface is None:
+                surface = self.draw(w, h)
+
+            return surface
+
+    def measure(self):
+        """
+        Same as get_size() but the result is memoized for the duration of the current render, use this
+        instead of get_size() when measuring children.
+        :return: (w, h)
+        """
+        return self._memoize(None, self._tracked_get_size)
+
+    def _tracked_get_size(self):
+        with track(self, GET_SIZE):
+            return self.get_size()
+
+    def _memoize(self, key, compute, *args):
+        """
+        Memoize compute(*args) under the key for the duration of the current render. Outside of a render
+        or after the layout was invalidated, compute is always called.
+        """
+        context = get_render_context()
+        if context is None:
+            return compute(*args)
+
+        token = context.token()
+        cache = getattr(self, '_measure_cache', None)
+        if cache is None or cache[0] != token:
+            cache = (token, {})
+            self._measure_cache = cache
+
+        values = cache[1]
+        if key not in values:
+            values[key] = compute(*args)
+
+        return values[key]
+
+    def _invalidate_layout(self):
+        """
+        Mark the sizes memoized by the render that measured this component as stale. Components that weren't
+        measured (e.g. while they're being built) don't invalidate anything.
+        """
+        cache = self.__dict__.get('_measure_cache')
+        if cache is not None:
+            invalidate_layout(cache[0])
+
+    def structural_hash(self):
+        """
+        Hash of everything that defines what the component draws: its type, parameters, sources and children
+        (including their placement). Components with equal hashes draw the same output for the same size.
+        The placement of the component itself (x, y, margin) is not included.
+        
+        The hash is stable across processes and memoized for the duration of the current render.
+        :return: hex digest or None if the component holds values that can't be hashed (e.g. functions)
+        """
+        return self._memoize('structural_hash', self._compute_structural_hash)
+
+    def _compute_structural_hash(self):
+        try:
+            return digest(describe_attributes(self))
+        except UnhashableError:
+            return None
+
     @abstractmethod
     def get_size(self):
         pass
-    
-        
+
+
 class Container(Component):
-    
+
     def __init__(self, x, y, w, h, margin=(0, 0, 0, 0), padding=(0, 0, 0, 0), layout=None, children=None):
 
         if layout is None:
@@ -67,10 +288,10 @@ class Container(Component):
 
             for child in self.children:
                 self.layout.validate_child(child)
-    
+
     def get_size(self):
-        return self.layout.get_size()    
-    
+        return self.layout.get_size()
+
     def add(self, child, *other_children):
         self.layout.validate_child(child)
         self.children.append(child)
@@ -79,21 +300,20 @@ class Container(Component):
             self.layout.validate_child(child)
             self.children.append(child)
 
-        
-    def _draw(self, surface, w, h):
+        self._invalidate_layout()
+
+
+    def _draw(self, cr, w, h):
         """
         Override this method for drawing under the Container's children
-        :param surface: surface to draw on
+        :param cr: context to draw into, translated to the Container's top-left corner
         :return:
         """
         pass
-    
-    def draw(self, w, h):
 
-        surface = super(Container, self).draw(w, h)
-        # surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(w), int(h))
-        
-        self._draw(surface, w, h)
-        self.layout._draw(surface, w, h)
-        
-        return surface
\ No newline at end of file
+    def _draw_contents(self, cr, w, h):
+        cr.save()
+        self._draw(cr, w, h)
+        cr.restore()
+
+        self.layout._draw(cr, w, h)
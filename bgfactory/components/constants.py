@@ -15,4 +15,6 @@ VALIGN_MIDDLE = 'middle'
 VALIGN_BOTTOM = 'bottom'
 
 FILL = 'fill'
-INFER = 'infer'
\ No newline at end of file
+INFER = 'infer'
+
+FIT_SHRINK = 'shrink'
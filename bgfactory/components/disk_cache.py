@@ -0,0 +1,242 @@
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+
+import cairocffi as cairo
+
+from bgfactory.components.structural_hash import digest
+
+
+try:
+    from importlib.metadata import version as _package_version, PackageNotFoundError
+
+    try:
+        LIBRARY_VERSION = _package_version('board-game-factory')
+    except PackageNotFoundError:
+        LIBRARY_VERSION = 'dev'
+except ImportError:
+    LIBRARY_VERSION = 'dev'
+
+# bump when the file layout changes
+_FORMAT_VERSION = 1
+_MAGIC = b'BGFR'
+_HEADER = struct.Struct('<4sBIII')
+_SUFFIX = '.bgfr'
+
+
+class DiskCache:
+    """
+    Persistent cache of rendered components, stored in a directory. Entries are keyed by the structural hash of
+    the component, its render size, the render options affecting the pixels (see RenderContext.pixel_key())
+    and the library version, so only the components that changed since the last build are rendered again.
+
+    The pixels are stored as zlib compressed ARGB32 data, loading an entry doesn't require any decoding besides
+    decompression. The total size of the directory is kept under max_bytes by removing the least recently used
+    entries. The directory can be shared by several processes.
+
+    Enable it for a render with render_context (caches the rendered component and the cards of CardSheets):
+
+        cache = DiskCache('.bgf_cache', max_bytes=2 * 1024 ** 3)
+        with render_context(disk_cache=cache):
+            card.image()
+
+    or pass it to make_printable_sheets(..., disk_cache=cache)
+    """
+
+    def __init__(self, path, max_bytes=2 * 1024 ** 3, compress_level=1):
+        """
+        :param path: directory of the cache, created if it doesn't exist
+        :param max_bytes: upper bound on the total size of the cache files
+        :param compress_level: zlib compression level of the stored pixels
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._bytes = None
+
+    def __getstate__(self):
+        # the cache can be passed to worker processes, they share the directory
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_bytes'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: (structural hash, width, height, *pixel key of the render)
+        :return: cairo.ImageSurface or None
+        """
+        path = self._entry_path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self._count_miss()
+            return None
+
+        surface = _decode(data)
+        if surface is None:
+            # corrupted or written by an incompatible version
+            self._remove(path)
+            self._count_miss()
+            return None
+
+        try:
+            # mtime is used to find the least recently used entries
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return surface
+
+    def _count_miss(self):
+        # the threads of a render look entries up concurrently
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, surface):
+        """
+        Store the surface and remove the least recently used entries if the cache is over budget.
+        :param key: (structural hash, width, height, *pixel key of the render)
+        :param surface: cairo.ImageSurface in FORMAT_ARGB32
+        """
+        data = _encode(surface, self.compress_level)
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._entry_path(key)
+        os.makedirs(path.parent, exist_ok=True)
+
+        # write to a temporary file first, so that concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+            over_budget = self._total_bytes() > self.max_bytes
+
+        if over_budget:
+            self.collect_garbage()
+
+    def collect_garbage(self, max_bytes=None):
+        """
+        Remove the least recently used entries until the cache fits into max_bytes
+        :param max_bytes: budget to enforce, defaults to self.max_bytes
+        :return: number of removed entries
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        entries = []
+        for path in self._iter_entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._bytes = total
+            self.evictions += removed
+
+        return removed
+
+    def clear(self):
+        self.collect_garbage(max_bytes=0)
+
+    def stats(self):
+        """
+        :return: dict with the counters of the cache
+        """
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, writes=self.writes, evictions=self.evictions,
+                        bytes=self._total_bytes(), max_bytes=self.max_bytes)
+
+    def _total_bytes(self):
+        if self._bytes is None:
+            total = 0
+            for path in self._iter_entries():
+                try:
+                    total += path.stat().st_size
+                except OSError:
+                    pass
+            self._bytes = total
+        return self._bytes
+
+    def _iter_entries(self):
+        return self.path.glob('*/*' + _SUFFIX)
+
+    def _entry_path(self, key):
+        name = digest((LIBRARY_VERSION, _FORMAT_VERSION) + tuple(key))
+        return self.path / name[:2] / (name + _SUFFIX)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _encode(surface, compress_level):
+    surface.flush()
+    w, h, stride = surface.get_width(), surface.get_height(), surface.get_stride()
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, w, h, stride)
+    return header + zlib.compress(bytes(surface.get_data()), compress_level)
+
+
+def _decode(data):
+    if len(data) < _HEADER.size:
+        return None
+
+    magic, format_version, w, h, stride = _HEADER.unpack_from(data)
+    if magic != _MAGIC or format_version != _FORMAT_VERSION:
+        return None
+
+    try:
+        pixels = bytearray(zlib.decompress(data[_HEADER.size:]))
+    except zlib.error:
+        return None
+
+    if len(pixels) != stride * h:
+        return None
+
+    return cairo.ImageSurface.create_for_data(pixels, cairo.FORMAT_ARGB32, w, h, stride)
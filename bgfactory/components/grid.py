@@ -4,7 +4,6 @@ from warnings import warn
 
 import cairocffi as cairo
 
-from bgfactory.common.profiler import profile
 from bgfactory.components.cairo_helpers import adjust_rect_size_by_line_width
 from bgfactory.components.component import Component
 from bgfactory.components.constants import FILL, INFER, COLOR_TRANSPARENT, COLOR_BLACK, \
@@ -14,6 +13,7 @@ from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
 from bgfactory.components.shape import Rectangle
 from bgfactory.components.source import convert_source
 from bgfactory.components.text import TextUniform
+from bgfactory.components.threaded_render import draw_children
 from bgfactory.components.utils import is_percent, parse_percent
 
 
@@ -174,6 +174,8 @@ class Grid(Component):
         cell._gridw += 1
         for k in range(cell._gridh):
             self.cells[i + k][j + 1] = None
+        
+        self._invalidate_layout()
 
     def cell_merge_down(self, i, j):
         """
@@ -207,6 +209,8 @@ class Grid(Component):
         cell._gridh += 1
         for k in range(cell._gridw):
             self.cells[i + 1][j + k] = None
+        
+        self._invalidate_layout()
     
     def add(self, i, j, child):
         self.cells[i][j].add(child)
@@ -220,8 +224,8 @@ class Grid(Component):
         else:
             raise ValueError('Only single integer or 2-tuple indexing is allowed like grid[3] or grid[1, 2]')
 
-    def _draw_outline(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
+    def _draw_outline(self, cr: cairo.Context, w, h):
+        cr.save()
 
         x, y, w, h = adjust_rect_size_by_line_width(0, 0, w, h, self.stroke_width)
         cr.rectangle(x, y, w, h)
@@ -232,6 +236,8 @@ class Grid(Component):
         self.stroke_src.set(cr, 0, 0, w, h)
         cr.stroke()
         
+        cr.restore()
+        
     def _get_cell_area_width(self, w):
         """
         Returns width to be filled by cells
@@ -291,7 +297,7 @@ class Grid(Component):
         for i in range(nrows):
             cell = self.cells[i][col_id]
             if cell is not None and cell._can_infer and cell._gridw == 1: # do not use merged cells for inferring width
-                w_max = max(w_max, cell.get_size()[0])
+                w_max = max(w_max, cell.measure()[0])
                 
         return w_max
     
@@ -302,7 +308,7 @@ class Grid(Component):
         for j in range(ncols):
             cell = self.cells[row_id][j]
             if cell is not None and cell._can_infer and cell._gridh == 1:
-                h_max = max(h_max, cell.get_size()[1])
+                h_max = max(h_max, cell.measure()[1])
                 
         return h_max
     
@@ -396,19 +402,27 @@ class Grid(Component):
 
         return heights
     
-    def draw(self, w, h):
+    def _draw_contents(self, cr, w, h):
         
-        surface = super(Grid, self).draw(w, h)
-        self._draw_outline(surface, w, h)
-
-        cr = cairo.Context(surface)
+        self._draw_outline(cr, w, h)
+        
+        draw_children(cr, self._arrange(w, h))
+    
+    def _arrange(self, w, h):
+        """
+        Arrange the cells into the area of the grid
+        :param w: width of the grid
+        :param h: height of the grid
+        :return: list of (cell, x, y, w, h)
+        """
         
         ncols = len(self.cols)
         nrows = len(self.rows)
         
-        widths = self._get_col_widths(w)
-        heights = self._get_row_heights(h)
+        widths = self._memoize(('col_widths', w), self._get_col_widths, w)
+        heights = self._memoize(('row_heights', h), self._get_row_heights, h)
         
+        rects = []
         cy = self.padding[1]
         
         for i in range(nrows):
@@ -434,11 +448,7 @@ class Grid(Component):
                         if k < cell._gridh - 1:
                             ch += self.vspace[i + k]
                             
-                    child_surface = cell.draw(cw, ch)
-                    profile('paint child surface')
-                    cr.set_source_surface(child_surface, cx, cy)
-                    cr.paint()
-                    profile()
+                    rects.append((cell, cx, cy, cw, ch))
                 else:
                     pass
 
@@ -450,19 +460,19 @@ class Grid(Component):
             if i < nrows - 1:
                 cy += self.vspace[i]
                 
-        return surface
+        return rects
                 
     def get_size(self):
         if self.w != INFER:
             w = self.w
         else:
-            widths = self._get_col_widths(None)
+            widths = self._memoize(('col_widths', None), self._get_col_widths, None)
             w = sum(widths) + sum(self.hspace) + self.padding[0] + self.padding[2]
 
         if self.h != INFER:
             h = self.h
         else:
-            heights = self._get_row_heights(None)
+            heights = self._memoize(('row_heights', None), self._get_row_heights, None)
             h = sum(heights) + sum(self.vspace) + self.padding[1] + self.padding[3]
 
         return w, h
@@ -486,6 +496,7 @@ class GridCell(Rectangle):
             self._can_infer = False
             
         self.children.append(child)
+        self._invalidate_layout()
 
 if __name__ == '__main__':
     
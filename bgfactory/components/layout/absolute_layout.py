@@ -1,6 +1,3 @@
-import cairocffi as cairo
-
-from bgfactory.common.profiler import profile
 from bgfactory.components.constants import INFER, FILL
 from bgfactory.components.layout.layout_manager import LayoutManager, LayoutError
 from bgfactory.components.utils import is_percent, parse_percent
@@ -31,7 +28,7 @@ class AbsoluteLayout(LayoutManager):
         max_w, max_h = 0, 0
         # infer required dimensions
         for i, child in enumerate(self.parent.children):
-            cw, ch = child.get_size()            
+            cw, ch = child.measure()
             cx = child.x
             cy = child.y
             
@@ -56,14 +53,13 @@ class AbsoluteLayout(LayoutManager):
         if self.parent.h == INFER and (is_percent(child.h) or is_percent(child.y)):
             raise LayoutError('height="n%" or y="n%" is not allowed when parent height=="infer"')
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        
-        cr = cairo.Context(surface)
+    def arrange(self, w, h):
         
+        rects = []
         for child in self.parent.children:
             # im_ = Image.new('RGBA', (self.w, self.h), COLOR_TRANSPARENT)
             
-            cw, ch = child.get_size()
+            cw, ch = child.measure()
             if cw == FILL:
                 cw = '100%'
             if ch == FILL:
@@ -81,12 +77,6 @@ class AbsoluteLayout(LayoutManager):
             if is_percent(cy):
                 cy = int(parse_percent(cy) * h)
             
-            child_surface = child.draw(cw, ch)
-
-            # im_ = child.image(cw, ch)
-            # child._draw(im_)
+            rects.append((child, cx, cy, cw, ch))
             
-            profile('paint child surface')
-            cr.set_source_surface(child_surface, cx, cy)
-            cr.paint()
-            profile()
\ No newline at end of file
+        return rects
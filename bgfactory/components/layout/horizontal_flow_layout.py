@@ -1,9 +1,6 @@
 from math import floor
 from warnings import warn
 
-import cairocffi as cairo
-
-from bgfactory.common.profiler import profile
 from bgfactory.components.component import Container
 from bgfactory.components.constants import HALIGN_LEFT, HALIGN_CENTER, HALIGN_RIGHT, INFER, FILL, VALIGN_TOP, \
     VALIGN_MIDDLE, VALIGN_BOTTOM
@@ -30,9 +27,7 @@ class HorizontalFlowLayout(LayoutManager):
         self.halign = halign
         self.valign = valign
 
-    def _draw(self, surface: cairo.Surface, w, h):
-
-        cr = cairo.Context(surface)
+    def arrange(self, w, h):
 
         children = self.parent.children
         w_padded = w - self.parent.padding[0] - self.parent.padding[2]
@@ -53,7 +48,7 @@ class HorizontalFlowLayout(LayoutManager):
         children_dimensions = []
         for i, child in enumerate(children):
 
-            cw, ch = child.get_size()
+            cw, ch = child.measure()
 
             if ch == FILL:
                 ch = '100%'
@@ -86,6 +81,7 @@ class HorizontalFlowLayout(LayoutManager):
         else:
             raise ValueError('unrecognized halign: ' + str(self.halign))
 
+        rects = []
         prev_margin = 0
         for child, (cw, ch) in zip(children, children_dimensions):
 
@@ -101,15 +97,12 @@ class HorizontalFlowLayout(LayoutManager):
             cx += max(prev_margin, child.margin[0])
             prev_margin = child.margin[2]
 
-            child_surface = child.draw(floor(cw), floor(ch))
-
-            profile('paint child surface')
-            cr.set_source_surface(child_surface, floor(cx), floor(cy))
-            cr.paint()
-            profile()
+            rects.append((child, floor(cx), floor(cy), floor(cw), floor(ch)))
 
             cx += cw
 
+        return rects
+
     def get_size(self):
         w, h = None, None
 
@@ -129,7 +122,7 @@ class HorizontalFlowLayout(LayoutManager):
         prev_margin = 0
 
         for i, child in enumerate(self.parent.children):
-            cw, ch = child.get_size()
+            cw, ch = child.measure()
             if self.parent.h == INFER:
                 max_h = max(
                     max_h, ch + self.parent.padding[1] + self.parent.padding[3] + child.margin[1] + child.margin[3])
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 
 import cairocffi as cairo
 
+from bgfactory.components.threaded_render import draw_children
+
 
 class LayoutError(ValueError):
     pass
@@ -9,6 +11,9 @@ class LayoutError(ValueError):
 
 class LayoutManager(ABC):
     
+    # the parent is described by its own structural hash
+    _hash_exclude = ('parent',)
+    
     def __init__(self):
         pass
     
@@ -16,8 +21,25 @@ class LayoutManager(ABC):
         self.parent = parent
     
     @abstractmethod
-    def _draw(self, surface: cairo.Surface, w, h):
+    def arrange(self, w, h):
+        """
+        Arrange the children of the parent into its area, the sizes of the children are taken from the
+        measure pass (Component.measure()).
+        :param w: width of the parent
+        :param h: height of the parent
+        :return: list of (child, x, y, w, h) in the order in which the children are drawn
+        """
         pass
+
+    def _draw(self, cr: cairo.Context, w, h):
+        """
+        Draw the children of the parent into cr
+        :param cr: context translated to the top-left corner of the parent and clipped to its area
+        :param w: width of the parent
+        :param h: height of the parent
+        :return:
+        """
+        draw_children(cr, self.arrange(w, h))
     
     @abstractmethod
     def get_size(self):
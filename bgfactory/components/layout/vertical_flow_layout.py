@@ -1,9 +1,6 @@
 from math import floor
 from warnings import warn
 
-import cairocffi as cairo
-
-from bgfactory.common.profiler import profile
 from bgfactory.components.component import Container
 from bgfactory.components.constants import HALIGN_LEFT, HALIGN_CENTER, HALIGN_RIGHT, INFER, FILL, VALIGN_TOP, \
     VALIGN_MIDDLE, VALIGN_BOTTOM
@@ -30,9 +27,7 @@ class VerticalFlowLayout(LayoutManager):
         self.halign = halign
         self.valign = valign
 
-    def _draw(self, surface: cairo.Surface, w, h):
-
-        cr = cairo.Context(surface)
+    def arrange(self, w, h):
 
         children = self.parent.children
         w_padded = w - self.parent.padding[0] - self.parent.padding[2]
@@ -53,7 +48,7 @@ class VerticalFlowLayout(LayoutManager):
         children_dimensions = []
         for i, child in enumerate(children):
             
-            cw, ch = child.get_size()
+            cw, ch = child.measure()
             if cw == FILL:
                 cw = '100%'
             if ch == FILL:
@@ -90,6 +85,7 @@ class VerticalFlowLayout(LayoutManager):
         else:
             raise ValueError('unrecognized valign: ' + str(self.valign))
         
+        rects = []
         prev_margin = 0
         for child, (cw, ch) in zip(children, children_dimensions):
 
@@ -105,15 +101,12 @@ class VerticalFlowLayout(LayoutManager):
             cy += max(prev_margin, child.margin[1])
             prev_margin = child.margin[3]
 
-            child_surface = child.draw(floor(cw), floor(ch))
-
-            profile('paint child surface')
-            cr.set_source_surface(child_surface, floor(cx), floor(cy))
-            cr.paint()
-            profile()
+            rects.append((child, floor(cx), floor(cy), floor(cw), floor(ch)))
 
             cy += ch
 
+        return rects
+
     def get_size(self):
         w, h = None, None
 
@@ -134,7 +127,7 @@ class VerticalFlowLayout(LayoutManager):
         prev_margin = 0
 
         for i, child in enumerate(self.parent.children):
-            cw, ch = child.get_size()
+            cw, ch = child.measure()
 
             if self.parent.w == INFER:
                 max_w = max(
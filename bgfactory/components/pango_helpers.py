@@ -1,9 +1,75 @@
+import threading
+
+import cairocffi as cairo
+
 from bgfactory.components.constants import HALIGN_LEFT, HALIGN_CENTER, HALIGN_RIGHT
 import pangocffi as pango
+import pangocairocffi as pc
 
 
 PANGO_SCALE = 1024
 
+_local = threading.local()
+
+
+def get_measure_context():
+    """
+    :return: cairo.Context used to lay out text for measuring, every thread has its own
+    """
+    cr = getattr(_local, 'measure_context', None)
+    if cr is None:
+        cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+        _local.measure_context = cr
+    return cr
+
+
+def get_pango_context():
+    """
+    :return: pango.Context shared by the text layouts of this thread. Creating it once (instead of for every
+        layout like pc.create_layout does) lets pango resolve the fonts (including the fontconfig fallbacks)
+        once per thread and reuse them from the caches of the default font map.
+
+        The context has the identity transformation and the font options of the measure context and it's
+        never updated for a draw target, so the layouts are shaped the same for measuring and drawing
+        and stay valid in the text layout cache. The layouts are drawn under the transformation of the target.
+    """
+    context = getattr(_local, 'pango_context', None)
+    if context is None:
+        context = pc.create_context(get_measure_context())
+        _local.pango_context = context
+    return context
+
+
+def create_layout():
+    """
+    Replacement of pc.create_layout(cr) creating the layout in the shared pango context of this thread,
+    don't pc.update_layout() it for a draw target
+    :return: pango.Layout
+    """
+    return pango.Layout(get_pango_context())
+
+
+_font_descriptions = {}
+
+
+def get_font_description(family, size, weight, style, stretch, gravity):
+    """
+    :return: pango.FontDescription interned by its attributes, the descriptions are only read after they are
+        created so the same one is shared by all the threads
+    """
+    key = family, size, weight, style, stretch, gravity
+    font_desc = _font_descriptions.get(key)
+    if font_desc is None:
+        font_desc = pango.FontDescription()
+        font_desc.family = family
+        font_desc.set_absolute_size(size * PANGO_SCALE)
+        font_desc.weight = weight
+        font_desc.style = style
+        font_desc.stretch = stretch
+        font_desc.gravity = gravity
+        font_desc = _font_descriptions.setdefault(key, font_desc)
+    return font_desc
+
 
 def convert_to_pango_align(halign):
     if halign == HALIGN_LEFT:
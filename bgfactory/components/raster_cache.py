@@ -0,0 +1,140 @@
+import threading
+from collections import OrderedDict
+
+from bgfactory.components.cairo_helpers import surface_bytes
+
+
+class SurfaceCache:
+    """
+    LRU cache of surfaces, bounded by the total number of bytes of the cached surfaces. The base of RasterCache
+    and AssetCache, which differ in how the surfaces get into the cache.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        :param max_bytes: upper bound on the total size of the cached surfaces
+        """
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        """
+        :return: the cached surface or None, counts the hit or the miss
+        """
+        with self._lock:
+            surface = self._entries.get(key)
+            if surface is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+    def put(self, key, surface):
+        """
+        Store the surface, evicting the least recently used ones to stay within max_bytes
+        :param surface: cairo.ImageSurface
+        """
+        size = surface_bytes(surface)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= surface_bytes(old)
+
+            self._entries[key] = surface
+            self.bytes += size
+
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= surface_bytes(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        :return: dict with the counters of the cache
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits, misses=self.misses, evictions=self.evictions, entries=len(self._entries),
+                bytes=self.bytes, max_bytes=self.max_bytes)
+
+
+class RasterCache(SurfaceCache):
+    """
+    LRU cache of rasterized subtrees, bounded by the total number of bytes of the cached surfaces.
+
+    Components are looked up by their structural hash, draw size and the render options affecting the pixels
+    (see RenderContext.pixel_key()), so identical subtrees (icons, frames, labels, whole cards...) are rasterized
+    once and then only painted. A subtree is rasterized into the cache only after it was seen min_uses times,
+    components that are drawn just once are drawn directly as usual.
+
+    Enable it for a render with render_context:
+
+        cache = RasterCache(max_bytes=512 * 1024 * 1024)
+        with render_context(raster_cache=cache):
+            sheet.image().save('sheet.png')
+        print(cache.stats())
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, min_uses=2, max_tracked=65536):
+        """
+        :param max_bytes: upper bound on the total size of the cached surfaces
+        :param min_uses: number of times a subtree has to be drawn before it's rasterized into the cache
+        :param max_tracked: number of recently seen subtrees that are remembered to count their uses
+        """
+        super(RasterCache, self).__init__(max_bytes)
+        self.min_uses = min_uses
+        self.max_tracked = max_tracked
+
+        self._uses = OrderedDict()
+
+    def get(self, key):
+        """
+        :param key: (structural hash, width, height, *pixel key of the render)
+        :return: the cached surface or None
+        """
+        return self._lookup(key)
+
+    def should_store(self, key):
+        """
+        Count a use of the subtree that missed the cache
+        :param key: (structural hash, width, height, *pixel key of the render)
+        :return: True if the subtree was used often enough to be rasterized into the cache
+        """
+        if self.min_uses <= 1:
+            return True
+
+        with self._lock:
+            uses = self._uses.pop(key, 0) + 1
+            if uses >= self.min_uses:
+                return True
+
+            self._uses[key] = uses
+            if len(self._uses) > self.max_tracked:
+                self._uses.popitem(last=False)
+
+            return False
+
+    def clear(self):
+        super(RasterCache, self).clear()
+        with self._lock:
+            self._uses.clear()
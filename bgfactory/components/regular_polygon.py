@@ -1,5 +1,6 @@
+from math import cos, pi, sin
+
 import cairocffi as cairo
-import numpy as np
 
 from bgfactory.components.constants import COLOR_BLACK, COLOR_WHITE
 from bgfactory.components.shape import Shape
@@ -19,9 +20,7 @@ class RegularPolygon(Shape):
         super(RegularPolygon, self).__init__(
             x, y, w, h, stroke_width=stroke_width, stroke_src=stroke_src, fill_src=fill_src, **kwargs)
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
-
+    def _draw(self, cr: cairo.Context, w, h):
         adj_delta = self.stroke_width * 1
 
         points = self.generate_polygon_points_and_calc_dims(self.num_points, self.radius - adj_delta, self.rotation)
@@ -74,27 +73,29 @@ class RegularPolygon(Shape):
         if num_points < 3:
             raise ValueError(f'Can only generate regular polygons for 3+ points. {num_points=}')
 
-        step_angle = 2 * np.pi / num_points
+        step_angle = 2 * pi / num_points
 
         half_step_angle = step_angle / 2
 
-        starting_angle = np.pi / 2 + (1 - rotation) * half_step_angle
-        point_angle = starting_angle % (2 * np.pi)
+        starting_angle = pi / 2 + (1 - rotation) * half_step_angle
+        point_angle = starting_angle % (2 * pi)
 
         points = []
 
         for i in range(num_points):
-            pointx = np.cos(point_angle) * radius
-            pointy = np.sin(point_angle) * radius
+            pointx = cos(point_angle) * radius
+            pointy = sin(point_angle) * radius
 
             points.append((pointx, pointy))
 
-            point_angle = (point_angle + step_angle) % (2 * np.pi)
+            point_angle = (point_angle + step_angle) % (2 * pi)
 
         return points
 
 
 if __name__ == '__main__':
+    import numpy as np
+
     from bgfactory.components.shape import Rectangle
 
     num_sides = [3, 5, 6, 8, 10, 12]
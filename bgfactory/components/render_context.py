@@ -0,0 +1,159 @@
+import threading
+from contextlib import contextmanager
+from itertools import count
+
+from bgfactory.common.config import bgfconfig
+
+
+_local = threading.local()
+_render_ids = count(1)
+
+# id of the outermost context of a render in progress -> layout generation of the render
+_layout_generations = {}
+_layout_generations_lock = threading.Lock()
+
+
+def invalidate_layout(token):
+    """
+    Mark the sizes memoized during the render that issued the token as stale, together with its nested and
+    forked contexts. Called whenever a component measured by a render changes in a way that can affect
+    the layout, e.g. a child is added or an attribute is set. Renders that are over aren't affected.
+    :param token: RenderContext.token() the changed component was measured with
+    """
+    root_id = token[1]
+    with _layout_generations_lock:
+        if root_id in _layout_generations:
+            _layout_generations[root_id] += 1
+
+
+class RenderContext:
+    """
+    State shared by all components taking part in one render (one call of Component.image()
+    or a top-level Component.draw()). Sizes measured during the render are memoized against
+    the token of the context, so they are reused by the arrange pass and by the parents
+    that measure the same child again, but never outlive the render.
+
+    Options of the render:
+        raster_cache: RasterCache used to reuse rasterized subtrees, None disables it
+        disk_cache: DiskCache used to load unchanged components rendered by previous builds (the rendered
+            component itself and the cards of CardSheets), None disables it
+        thread_pool: concurrent.futures.ThreadPoolExecutor used to rasterize the children of a container
+            concurrently, None draws them one by one
+        tolerance: tolerance of cairo when converting curves to lines, None uses bgfconfig.tolerance
+        report: RenderReport recording the calls, times and surfaces of the components, None disables it
+        image_filter: cairo filter used to sample all the scaled images of the render (e.g. cairo.FILTER_FAST
+            for drafts, cairo.FILTER_BEST for print), None uses the filter of each image source
+        asset_cache: cache of the images decoded by the sources, e.g. a SharedAssetCache shared by the worker
+            processes, None uses the process-wide asset_cache
+    """
+
+    def __init__(self, raster_cache=None, disk_cache=None, thread_pool=None, tolerance=None, report=None,
+                 image_filter=None, asset_cache=None):
+        self.render_id = next(_render_ids)
+        # the outermost context of the render, nested contexts share its layout generation
+        self.root_id = self.render_id
+        self.raster_cache = raster_cache
+        self.disk_cache = disk_cache
+        self.thread_pool = thread_pool
+        self.report = report
+        self.image_filter = image_filter
+        self.asset_cache = asset_cache
+        # read once, so that the render doesn't depend on the global config while it's running
+        self.tolerance = bgfconfig.tolerance if tolerance is None else tolerance
+
+        # > 0 while a subtree is being rasterized into the raster cache
+        self.caching_depth = 0
+
+        # bitmaps of the sources decoded during the render, reusing the same surface for all the uses
+        # of a bitmap also lets vector backends (PDF) embed it only once
+        self.bitmaps = {}
+
+    def token(self):
+        return self.render_id, self.root_id, _layout_generations.get(self.root_id, 0)
+
+    def pixel_key(self):
+        """
+        :return: the options of the render that change the rendered pixels, a part of the keys of the cached
+            surfaces, so that a cache reused with other options doesn't serve stale pixels
+        """
+        return self.tolerance, self.image_filter
+
+    def options(self):
+        return dict(raster_cache=self.raster_cache, disk_cache=self.disk_cache, thread_pool=self.thread_pool,
+                    tolerance=self.tolerance, report=self.report, image_filter=self.image_filter,
+                    asset_cache=self.asset_cache)
+
+    def fork(self):
+        """
+        :return: context for a worker thread taking part in this render, it shares everything with this
+            context except for the per-thread state. Workers don't spawn further workers.
+        """
+        context = RenderContext.__new__(RenderContext)
+        context.__dict__.update(self.__dict__)
+        context.thread_pool = None
+        return context
+
+
+def get_render_context():
+    """
+    :return: the RenderContext of the render in progress in this thread or None
+    """
+    return getattr(_local, 'context', None)
+
+
+@contextmanager
+def render_context(**options):
+    """
+    Enter a render. Nested calls reuse the context of the outer render, unless they set some options,
+    then a new context is used for their duration, inheriting the options that are not set.
+    :param options: see RenderContext
+    """
+    outer = get_render_context()
+
+    if outer is not None and not options:
+        yield outer
+        return
+
+    if outer is not None:
+        options = dict(outer.options(), **options)
+
+    context = RenderContext(**options)
+    if outer is not None:
+        context.root_id = outer.root_id
+    else:
+        with _layout_generations_lock:
+            _layout_generations[context.root_id] = 0
+
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = outer
+        if outer is None:
+            with _layout_generations_lock:
+                del _layout_generations[context.root_id]
+
+
+@contextmanager
+def use_render_context(context):
+    """
+    Make context the render in progress in this thread for the duration of the with block,
+    used to run a part of a render in another thread
+    :param context: RenderContext
+    """
+    outer = get_render_context()
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = outer
+
+
+def get_tolerance():
+    """
+    :return: tolerance of the render in progress in this thread
+    """
+    context = get_render_context()
+    if context is None:
+        return bgfconfig.tolerance
+    return context.tolerance
@@ -0,0 +1,279 @@
+import json
+import threading
+import time
+import weakref
+
+from bgfactory.components.cairo_helpers import surface_bytes
+from bgfactory.components.render_context import get_render_context
+
+
+GET_SIZE = 'get_size'
+DRAW = 'draw'
+
+
+class _NullTracker:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TRACKER = _NullTracker()
+
+
+class _Tracker:
+
+    __slots__ = ('report', 'node', 'kind', 'start', 'children')
+
+    def __init__(self, report, node, kind):
+        self.report = report
+        self.node = node
+        self.kind = kind
+
+    def __enter__(self):
+        self.children = 0
+        self.report._stack().append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+
+        stack = self.report._stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+
+        self.report._record(self.node, self.kind, duration, duration - self.children)
+        return False
+
+
+class RenderReport:
+    """
+    Records what happens during a render for every component (node) of the rendered tree: the number
+    of get_size() and draw calls, the time spent in them and the bytes of the surfaces the node allocated.
+    The results are also aggregated by component class, together with the peak memory of the surfaces
+    that were alive at the same time.
+
+    The nodes are identified by their path in the tree, e.g. 'CardSheet[0]/Rectangle[2]/TextUniform[0]'
+    (the index counts the siblings of the same class), so the reports of two builds can be diffed. The report
+    keeps only the paths and the counters, not the components.
+
+        report = RenderReport()
+        with render_context(report=report):
+            sheet.image()
+        report.save('report.json')
+    """
+
+    def __init__(self):
+        # path -> counters of the node
+        self._nodes = {}
+        # id of a live component -> its path, the entry is removed when the component is garbage collected
+        # so that the id can't be taken for another component
+        self._paths = {}
+        self._root_children = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.surface_bytes = 0
+        self.surface_count = 0
+        self.live_surface_bytes = 0
+        self.peak_surface_bytes = 0
+
+    def track(self, component, kind):
+        """
+        :param component: the tracked component
+        :param kind: GET_SIZE or DRAW
+        :return: context manager measuring the call
+        """
+        node = self._get_node(component)
+
+        # e.g. draw() called from draw_into() of the same component is a single draw
+        stack = self._stack()
+        if stack and stack[-1].node is node and stack[-1].kind == kind:
+            return _NULL_TRACKER
+
+        return _Tracker(self, node, kind)
+
+    def add_surface(self, surface):
+        """
+        Record a surface allocated by the component that is being tracked in this thread
+        :param surface: cairo.ImageSurface
+        """
+        size = self._add_surface_bytes(surface)
+        weakref.finalize(surface, self._release_surface, size)
+
+    def add_group(self, cr):
+        """
+        Record the intermediate surface cr.push_group() just created for the component that is being tracked
+        in this thread, it's live until release_group()
+        :param cr: cairo.Context
+        """
+        self._groups().append(self._add_surface_bytes(cr.get_group_target()))
+
+    def release_group(self):
+        """
+        Record that the last group added in this thread was popped
+        """
+        self._release_surface(self._groups().pop())
+
+    def to_dict(self):
+        """
+        :return: the report as a dict of primitives (JSON serializable)
+        """
+        keys = ('get_size_calls', 'draw_calls', 'get_size_time', 'draw_time', 'self_time', 'surface_bytes',
+                'surface_count')
+
+        with self._lock:
+            nodes = [
+                {key: value for key, value in node.items() if not key.startswith('_')}
+                for node in self._nodes.values()
+            ]
+
+        nodes.sort(key=lambda node: node['path'])
+        for node in nodes:
+            for key in ('get_size_time', 'draw_time', 'self_time'):
+                node[key] /= 1e9
+
+        classes = {}
+        for node in nodes:
+            entry = classes.setdefault(node['class'], dict({key: 0 for key in keys}, nodes=0))
+            entry['nodes'] += 1
+            for key in keys:
+                entry[key] += node[key]
+
+        return dict(
+            surface_bytes=self.surface_bytes,
+            surface_count=self.surface_count,
+            peak_surface_bytes=self.peak_surface_bytes,
+            classes=dict(sorted(classes.items())),
+            nodes=nodes,
+        )
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=1, sort_keys=True)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+    def _add_surface_bytes(self, surface):
+        size = surface_bytes(surface)
+
+        stack = self._stack()
+        node = stack[-1].node if stack else self._get_node(None)
+
+        with self._lock:
+            node['surface_bytes'] += size
+            node['surface_count'] += 1
+            self.surface_bytes += size
+            self.surface_count += 1
+            self.live_surface_bytes += size
+            self.peak_surface_bytes = max(self.peak_surface_bytes, self.live_surface_bytes)
+
+        return size
+
+    def _get_node(self, component):
+        key = None if component is None else id(component)
+        path = self._paths.get(key)
+        if path is not None:
+            return self._nodes[path]
+
+        stack = self._stack()
+        with self._lock:
+            path = self._paths.get(key)
+            if path is not None:
+                return self._nodes[path]
+
+            if component is None:
+                # surfaces allocated outside of any tracked component
+                path, class_name = '', ''
+            else:
+                parent = stack[-1].node if stack else None
+                class_name = type(component).__name__
+                counts = parent['_children'] if parent is not None else self._root_children
+                index = counts.get(class_name, 0)
+                counts[class_name] = index + 1
+                path = f'{class_name}[{index}]'
+                if parent is not None:
+                    path = parent['path'] + '/' + path
+
+            node = {
+                'path': path, 'class': class_name, 'get_size_calls': 0, 'draw_calls': 0, 'get_size_time': 0,
+                'draw_time': 0, 'self_time': 0, 'surface_bytes': 0, 'surface_count': 0, '_children': {},
+            }
+            self._nodes[path] = node
+            self._paths[key] = path
+
+        if component is not None:
+            # refers to the dict only, the report can be collected before the component
+            weakref.finalize(component, self._paths.pop, key, None)
+
+        return node
+
+    def _record(self, node, kind, duration, self_duration):
+        with self._lock:
+            if kind == GET_SIZE:
+                node['get_size_calls'] += 1
+                node['get_size_time'] += duration
+            else:
+                node['draw_calls'] += 1
+                node['draw_time'] += duration
+            node['self_time'] += self_duration
+
+    def _release_surface(self, size):
+        with self._lock:
+            self.live_surface_bytes -= size
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _groups(self):
+        groups = getattr(self._local, 'groups', None)
+        if groups is None:
+            groups = self._local.groups = []
+        return groups
+
+
+def track(component, kind):
+    """
+    :return: context manager recording the call into the report of the render in progress, if there is one
+    """
+    context = get_render_context()
+    if context is None or context.report is None:
+        return _NULL_TRACKER
+    return context.report.track(component, kind)
+
+
+def add_surface(surface):
+    """
+    Record the surface into the report of the render in progress, if there is one
+    """
+    context = get_render_context()
+    if context is not None and context.report is not None:
+        context.report.add_surface(surface)
+
+
+def push_group(cr):
+    """
+    cr.push_group() recording the surface of the group into the report of the render in progress, if there is one
+    """
+    cr.push_group()
+    context = get_render_context()
+    if context is not None and context.report is not None:
+        context.report.add_group(cr)
+
+
+def pop_group_to_source(cr):
+    """
+    cr.pop_group_to_source() of a group pushed by push_group()
+    """
+    cr.pop_group_to_source()
+    context = get_render_context()
+    if context is not None and context.report is not None:
+        context.report.release_group()
@@ -4,10 +4,10 @@ from warnings import warn
 
 import cairocffi as cairo
 
-from bgfactory.common.config import bgfconfig
 from bgfactory.components.cairo_helpers import adjust_rect_size_by_line_width
 from bgfactory.components.component import Container
 from bgfactory.components.constants import COLOR_BLACK, COLOR_WHITE, FILL
+from bgfactory.components.render_context import get_tolerance
 from bgfactory.components.source import convert_source, RGBASource
 from bgfactory.components.utils import is_percent
 
@@ -42,7 +42,7 @@ class Shape(Container):
             cr.set_line_cap(self.line_cap)
         if self.line_join:
             cr.set_line_join(self.line_join)
-        cr.set_tolerance(bgfconfig.tolerance)
+        cr.set_tolerance(get_tolerance())
         cr.set_line_width(self.stroke_width)
         if self.fill_src:
             self.fill_src.set(cr, 0, 0, w, h)
@@ -77,9 +77,7 @@ class Line(Shape):
         super(Line, self).__init__(x, y, w, h, stroke_width=stroke_width, stroke_src=stroke_src, dash=dash,
                                    line_cap=line_cap, fill_src=None)
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
-
+    def _draw(self, cr: cairo.Context, w, h):
         cr.move_to(self.x1, self.y1)
         cr.line_to(self.x2, self.y2)
 
@@ -88,9 +86,7 @@ class Line(Shape):
 
 class Rectangle(Shape):
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
-
+    def _draw(self, cr: cairo.Context, w, h):
         x, y, w_shape, h_shape = adjust_rect_size_by_line_width(0, 0, w, h, self.stroke_width)
         cr.rectangle(x, y, w_shape, h_shape)
         
@@ -110,9 +106,7 @@ class Circle(Shape):
         super(Circle, self).__init__(x, y, w, h, stroke_width=stroke_width, 
                                      padding=[e + stroke_width for e in padding], **kwargs)
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
-
+    def _draw(self, cr: cairo.Context, w, h):
         x, y, w_shape, h_shape = adjust_rect_size_by_line_width(0, 0, w, h, self.stroke_width)
         
         draw_radius = min(w_shape, h_shape) / 2
@@ -132,8 +126,7 @@ class RoundedRectangle(Shape):
         super(RoundedRectangle, self).__init__(x, y, w, h, stroke_width, stroke_src, fill_src, layout, margin, padding,
                                                **kwargs)
 
-    def _draw(self, surface: cairo.Surface, w, h):
-        cr = cairo.Context(surface)
+    def _draw(self, cr: cairo.Context, w, h):
         x, y, w_shape, h_shape = adjust_rect_size_by_line_width(0, 0, w, h, self.stroke_width)
         x1, y1, x2, y2 = x, y, x + w_shape, y + h_shape
 
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import uuid
+from multiprocessing import resource_tracker, shared_memory, util
+
+import cairocffi as cairo
+
+# magic, width, height and stride of the image, then a byte set to 1 once the pixels are written
+_HEADER = struct.Struct('<4sIII')
+_HEADER_MAGIC = b'BGFS'
+_READY_OFFSET = _HEADER.size
+# the pixels start at a cache line boundary
+_PIXELS_OFFSET = 64
+
+# the caches unpickled in this process by their prefix, all the tasks sent to a worker share one
+_instances = {}
+_instances_lock = threading.Lock()
+
+# segments closed while their surfaces were still in use, they stay mapped until the process exits
+_in_use = []
+
+
+def _get_instance(prefix, registry_path, owner):
+    with _instances_lock:
+        cache = _instances.get(prefix)
+        # an instance inherited from the parent by a forked worker maps the segments of the parent
+        if cache is None or cache._pid != os.getpid():
+            cache = SharedAssetCache.__new__(SharedAssetCache)
+            cache.prefix = prefix
+            cache._registry_path = registry_path
+            cache._owner = owner
+            cache._refs = 0
+            cache._init_local()
+            _instances[prefix] = cache
+            # the workers of multiprocessing pools exit with os._exit(), skipping atexit, but they run
+            # the finalizers of multiprocessing before that
+            util.Finalize(cache, cache.close, exitpriority=0)
+
+        return cache
+
+
+class SharedAssetCache:
+    """
+    Cache of the decoded images placed in shared memory, so that the worker processes of a pool map the same
+    pixels instead of each of them keeping a private copy of every card background and icon. Use it as
+    the asset_cache option of the render context, the cache pickled into the tasks of the workers refers to
+    the same shared memory.
+
+    The first process needing an image decodes it into a new segment, the others map the segment. The surfaces
+    of the segments are only read - painted as sources - never drawn into. The segments are still mapped writable,
+    multiprocessing.shared_memory has no read-only mapping.
+
+    The segments belong to the process that created the cache. The cache is reference counted with acquire()
+    and release() (or with blocks), the last release unlinks all the segments, so release it after the pool
+    was shut down. Segments still mapped by a process are freed when it unmaps them.
+
+        with SharedAssetCache() as cache, ProcessPoolExecutor(4) as pool:
+            pool.map(render_card, cards, repeat(dict(asset_cache=cache)))
+
+    make_printable_sheets(..., jobs=4, shared_assets=True) does this for the cards of a deck.
+    """
+
+    def __init__(self):
+        # short enough for the 31 characters of macOS shared memory names
+        self.prefix = f'bgf{uuid.uuid4().hex[:8]}'
+        fd, self._registry_path = tempfile.mkstemp(prefix=self.prefix, suffix='.segments')
+        os.close(fd)
+        self._owner = os.getpid()
+        self._refs = 0
+        self._init_local()
+
+        if os.name == 'posix':
+            # started before the pool, the workers then register the segments with the tracker of this process
+            # instead of starting their own ones that would unlink the segments when the workers exit
+            resource_tracker.ensure_running()
+
+        with _instances_lock:
+            _instances[self.prefix] = self
+
+    def _init_local(self):
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+
+        self._surfaces = {}
+        self._segments = []
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return _get_instance, (self.prefix, self._registry_path, self._owner)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def acquire(self):
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        """
+        Drop a reference, the last one closes the cache
+        """
+        with self._lock:
+            self._refs -= 1
+            refs = self._refs
+
+        if refs <= 0:
+            self.close()
+
+    def get(self, key, create):
+        """
+        :param key: hashable key of the surface with a stable repr(), including the version of the file it was
+            created from
+        :param create: function() -> cairo.ImageSurface in FORMAT_ARGB32, called when no process created
+            the surface yet
+        :return: surface over the shared memory, or a private one when the shared memory can't be used
+        """
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self.hits += 1
+                return surface
+            self.misses += 1
+
+        name = self._segment_name(key)
+
+        surface = self._attach(name)
+        if surface is None:
+            surface = self._create(name, create)
+
+        with self._lock:
+            return self._surfaces.setdefault(key, surface)
+
+    def _segment_name(self, key):
+        return f'{self.prefix}_{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}'
+
+    def _attach(self, name):
+        """
+        :return: surface over the segment or None when it doesn't exist or is still being written
+        """
+        try:
+            segment = shared_memory.SharedMemory(name)
+        except (FileNotFoundError, ValueError):
+            # ValueError when the segment was created, but it wasn't resized yet
+            return None
+
+        return self._wrap(segment)
+
+    def _create(self, name, create):
+        surface = create()
+        surface.flush()
+        size = surface.get_stride() * surface.get_height()
+
+        try:
+            segment = shared_memory.SharedMemory(name, create=True, size=_PIXELS_OFFSET + size)
+        except FileExistsError:
+            # another process created it meanwhile
+            shared = self._attach(name)
+            return surface if shared is None else shared
+        except OSError:
+            # shared memory is not available, the surface stays private to this process
+            return surface
+
+        with open(self._registry_path, 'a') as f:
+            f.write(name + '\n')
+
+        segment.buf[_PIXELS_OFFSET:_PIXELS_OFFSET + size] = surface.get_data()
+        _HEADER.pack_into(segment.buf, 0, _HEADER_MAGIC, surface.get_width(), surface.get_height(),
+                          surface.get_stride())
+        # written last, the other processes use the segment only after that
+        segment.buf[_READY_OFFSET] = 1
+
+        return self._wrap(segment)
+
+    def _wrap(self, segment):
+        magic, w, h, stride = _HEADER.unpack_from(segment.buf)
+        if magic != _HEADER_MAGIC or segment.buf[_READY_OFFSET] != 1:
+            segment.close()
+            return None
+
+        data = segment.buf[_PIXELS_OFFSET:_PIXELS_OFFSET + stride * h]
+        surface = cairo.ImageSurface.create_for_data(data, cairo.FORMAT_ARGB32, w, h, stride)
+
+        with self._lock:
+            self._segments.append(segment)
+        return surface
+
+    def close(self):
+        """
+        Unmap the segments in this process, in the process that created the cache also unlink all of them
+        """
+        with self._lock:
+            self._surfaces.clear()
+            segments = self._segments
+            self._segments = []
+
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                # a surface of the segment is still in use, it's unmapped with the process
+                _in_use.append(segment)
+
+        if os.getpid() != self._owner or not os.path.exists(self._registry_path):
+            return
+
+        with open(self._registry_path) as f:
+            names = set(f.read().split())
+
+        for name in names:
+            try:
+                segment = shared_memory.SharedMemory(name)
+            except (FileNotFoundError, ValueError):
+                continue
+            segment.close()
+            segment.unlink()
+
+        os.remove(self._registry_path)
+
+        with _instances_lock:
+            _instances.pop(self.prefix, None)
+
+    def stats(self):
+        """
+        :return: dict with the counters of the cache in this process
+        """
+        return dict(hits=self.hits, misses=self.misses, entries=len(self._surfaces), segments=len(self._segments))
@@ -4,11 +4,29 @@ from collections.abc import Iterable
 import cairocffi as cairo
 from cairocffi import Context
 
+from bgfactory.components.asset_cache import asset_cache, file_version
+from bgfactory.components.cairo_helpers import surface_from_image
 from bgfactory.components.constants import INFER, FILL, VALIGN_TOP, VALIGN_MIDDLE, VALIGN_BOTTOM, HALIGN_LEFT, \
     HALIGN_CENTER, HALIGN_RIGHT
+from bgfactory.components.render_context import get_render_context
+from bgfactory.components.render_report import add_surface
 from bgfactory.components.utils import is_percent, parse_percent
 
 
+def _get_render_bitmaps():
+    context = get_render_context()
+    if context is None:
+        return {}
+    return context.bitmaps
+
+
+def _get_asset_cache():
+    context = get_render_context()
+    if context is None or context.asset_cache is None:
+        return asset_cache
+    return context.asset_cache
+
+
 def convert_source(src):
     if isinstance(src, Iterable):
         src = tuple(src)
@@ -67,7 +85,8 @@ AUTO = 'auto'
     
 class PNGSource(Source):
     
-    def __init__(self, path, x=0, y=0, w=FILL, h=FILL, halign=HALIGN_LEFT, valign=VALIGN_TOP):
+    def __init__(self, path, x=0, y=0, w=FILL, h=FILL, halign=HALIGN_LEFT, valign=VALIGN_TOP,
+                 filter=cairo.FILTER_GOOD):
         """
         Use this to render a png image as a background or use it for the strokes - borders/lines/text/etc.
         :param path: path to the png file
@@ -87,6 +106,8 @@ class PNGSource(Source):
         :param halign: determines how the png image will be horizontally aligned w.r.t. the target. For x=0, y=0, w=AUTO, h=FILL,
         the HALIGN_LEFT will result in the image being aligned with the left edge, HALIGN_CENTER in the center,
         and HALIGN_RIGHT with the right edge
+        :param filter: filter used to sample the scaled image, e.g. cairo.FILTER_FAST for drafts
+        and cairo.FILTER_BEST for print. The image_filter option of render_context overrides it for the whole render.
         """
         
         self.x = x
@@ -95,15 +116,41 @@ class PNGSource(Source):
         self.h = h
         self.halign = halign
         self.valign = valign
+        self.filter = filter
         
         self.path = path
 
+    def structural_key(self):
+        return str(self.path), file_version(self.path), self.x, self.y, self.w, self.h, self.halign, self.valign, \
+            self.filter
+
+    def _decode(self):
+        surface = cairo.ImageSurface.create_from_png(str(self.path))
+        add_surface(surface)
+        return surface
+
+    def _get_image_size(self):
+        surface_img = self._get_surface(None, None)
+        return surface_img.get_width(), surface_img.get_height()
+
+    def _get_surface(self, w_target, h_target):
+        """
+        :return: the decoded image for painting it at the target size, the pattern scales it to the target size
+        """
+        # the bitmaps of the render are looked up first, the asset cache is checked (with a stat of the file)
+        # only once per render
+        bitmaps = _get_render_bitmaps()
+
+        surface_img = bitmaps.get(('png', str(self.path)))
+        if surface_img is None:
+            surface_img = _get_asset_cache().get(('png', str(self.path), file_version(self.path)), self._decode)
+            bitmaps[('png', str(self.path))] = surface_img
+
+        return surface_img
+
     def set(self, cairo_context: Context, x, y, w, h):
         
-        surface_img = cairo.ImageSurface.create_from_png(str(self.path))
-        
-        iw = surface_img.get_width()
-        ih = surface_img.get_height()
+        iw, ih = self._get_image_size()
         
         if self.w == AUTO and self.h == AUTO:
             self.w = FILL
@@ -143,18 +190,8 @@ class PNGSource(Source):
         w_target = int(w_target)
         h_target = int(h_target)
         
-        scalex = w_target / iw
-        scaley = h_target / ih
-        
         # print(iw, ih)
         # print(w_target, h_target)
-        # print(scalex, scaley)
-        
-        output_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w_target, h_target)
-        cr = cairo.Context(output_surface)
-        cr.scale(scalex, scaley)
-        cr.set_source_surface(surface_img)
-        cr.paint()
         
         if self.halign == HALIGN_LEFT:
             x_ = self.x + x
@@ -174,4 +211,118 @@ class PNGSource(Source):
         else:
             raise ValueError('Invalid valign value {}'.format(self.valign))
         
-        cairo_context.set_source_surface(output_surface, x_, y_)
+        if w_target <= 0 or h_target <= 0:
+            cairo_context.set_source_rgba(0, 0, 0, 0)
+            return
+
+        # the original image is sampled directly through the matrix of the pattern (which maps the user space
+        # onto the image), there's no scaled copy of it
+        surface_img = self._get_surface(w_target, h_target)
+        pattern = cairo.SurfacePattern(surface_img)
+        scalex = w_target / surface_img.get_width()
+        scaley = h_target / surface_img.get_height()
+        pattern.set_matrix(cairo.Matrix(xx=1 / scalex, yy=1 / scaley, x0=-x_ / scalex, y0=-y_ / scaley))
+
+        context = get_render_context()
+        image_filter = context.image_filter if context is not None and context.image_filter is not None else \
+            self.filter
+        pattern.set_filter(image_filter)
+
+        cairo_context.set_source(pattern)
+
+
+def _draft_reduce(iw, ih, w_target, h_target):
+    """
+    :return: the largest of the reductions JPEG decoders support (1/2, 1/4, 1/8) after which the image is still
+        at least the target size, 1 if it can't be reduced
+    """
+    scale = min(iw // max(w_target, 1), ih // max(h_target, 1))
+    for reduce in (8, 4, 2):
+        if scale >= reduce:
+            return reduce
+    return 1
+
+
+class ImageSource(PNGSource):
+
+    def __init__(self, path, x=0, y=0, w=FILL, h=FILL, halign=HALIGN_LEFT, valign=VALIGN_TOP,
+                 filter=cairo.FILTER_GOOD):
+        """
+        Same as PNGSource for any image Pillow reads - JPEG, WebP, TIFF, PNG, ... JPEG images are decoded
+        at a reduced size (1/2, 1/4 or 1/8) when the target is that much smaller, e.g. a 4000x6000 photo in a
+        card frame of 750x1050 pixels is decoded at 1/4, which is several times faster than the full decode.
+        For the parameters see PNGSource.
+        """
+        super(ImageSource, self).__init__(path, x, y, w, h, halign, valign, filter)
+
+    def _read_header(self):
+        """
+        :return: (format, (width, height)) of the image, Pillow reads only the header of the file
+        """
+        bitmaps = _get_render_bitmaps()
+
+        header = bitmaps.get(('image_header', str(self.path)))
+        if header is None:
+            from PIL import Image
+
+            with Image.open(self.path) as image:
+                header = image.format, image.size
+            bitmaps[('image_header', str(self.path))] = header
+
+        return header
+
+    def _decode(self, reduce):
+        from PIL import Image
+
+        with Image.open(self.path) as image:
+            if reduce > 1:
+                # the decoder scales the image down while decoding
+                image.draft('RGB', (image.width // reduce, image.height // reduce))
+            surface = surface_from_image(image)
+
+        add_surface(surface)
+        return surface
+
+    def _get_image_size(self):
+        return self._read_header()[1]
+
+    def _get_surface(self, w_target, h_target):
+        image_format, (iw, ih) = self._read_header()
+        reduce = _draft_reduce(iw, ih, w_target, h_target) if image_format == 'JPEG' else 1
+
+        bitmaps = _get_render_bitmaps()
+
+        surface_img = bitmaps.get(('image', str(self.path), reduce))
+        if surface_img is None:
+            surface_img = _get_asset_cache().get(
+                ('image', str(self.path), file_version(self.path), reduce), lambda: self._decode(reduce))
+            bitmaps[('image', str(self.path), reduce)] = surface_img
+
+        return surface_img
+
+
+class PackSource(PNGSource):
+
+    def __init__(self, pack, name, x=0, y=0, w=FILL, h=FILL, halign=HALIGN_LEFT, valign=VALIGN_TOP,
+                 filter=cairo.FILTER_GOOD):
+        """
+        Same as PNGSource for an image of an asset pack (see asset_pack.compile_asset_pack()), the image is
+        neither decoded nor copied, its pixels are painted straight from the memory-mapped pack. When the pack
+        has pre-scaled levels, the smallest one at least the target size is used.
+        :param pack: AssetPack
+        :param name: path of the image relative to the compiled directory, with forward slashes
+        For the other parameters see PNGSource.
+        """
+        super(PackSource, self).__init__(name, x, y, w, h, halign, valign, filter)
+        self.pack = pack
+        self.name = name
+
+    def structural_key(self):
+        return self.pack.path, self.pack.version(), self.name, self.x, self.y, self.w, self.h, self.halign, \
+            self.valign, self.filter
+
+    def _get_image_size(self):
+        return self.pack.get_size(self.name)
+
+    def _get_surface(self, w_target, h_target):
+        return self.pack.get(self.name, w_target, h_target)
@@ -0,0 +1,79 @@
+import hashlib
+from enum import Enum
+from pathlib import PurePath
+
+
+class UnhashableError(TypeError):
+    pass
+
+
+def structural_key(value):
+    """
+    Convert a value used to define a component into a canonical structure of primitives that identifies it.
+    Components are described by their structural_hash() and placement, other objects can define
+    structural_key() to describe themselves, otherwise their public attributes are used.
+
+    Objects that can't be described reliably (e.g. functions or objects of native libraries) raise UnhashableError.
+    :param value: value to describe
+    :return: nested tuple of primitives
+    """
+    # late import, the components depend on this module
+    from bgfactory.components.component import Component
+
+    if value is None or isinstance(value, (bool, str, bytes)):
+        return value
+    if isinstance(value, Enum):
+        return repr(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, Component):
+        digest = value.structural_hash()
+        if digest is None:
+            raise UnhashableError(f'{type(value).__name__} can not be hashed')
+        return 'component', digest, structural_key(value.x), structural_key(value.y), structural_key(value.margin)
+    if isinstance(value, (list, tuple)):
+        return tuple(structural_key(e) for e in value)
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted(((structural_key(k), structural_key(v)) for k, v in value.items()), key=repr))
+    if isinstance(value, PurePath):
+        return str(value)
+    if hasattr(value, 'structural_key'):
+        return (_type_name(value),) + tuple(value.structural_key())
+
+    module = type(value).__module__
+    if callable(value) or not hasattr(value, '__dict__') or \
+            module.startswith(('cairocffi', 'pangocffi', 'pangocairocffi')):
+        raise UnhashableError(f'values of type {type(value)} can not be hashed')
+
+    return describe_attributes(value)
+
+
+def describe_attributes(obj, exclude=()):
+    """
+    Describe obj by its type and public attributes
+    :param obj: object to describe
+    :param exclude: names of attributes to leave out
+    :return: tuple
+    """
+    exclude = set(exclude) | set(getattr(type(obj), '_hash_exclude', ()))
+
+    attributes = []
+    for name, attr in sorted(vars(obj).items()):
+        if name.startswith('_') or name in exclude:
+            continue
+        attributes.append((name, structural_key(attr)))
+
+    return (_type_name(obj),) + tuple(attributes)
+
+
+def digest(key):
+    """
+    :param key: structural key
+    :return: hex digest of the key, stable across processes
+    """
+    return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _type_name(obj):
+    cls = type(obj)
+    return f'{cls.__module__}.{cls.__qualname__}'
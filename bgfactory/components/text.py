@@ -1,5 +1,7 @@
+import re
 from abc import abstractmethod
-from math import ceil
+from functools import lru_cache
+from math import ceil, floor
 from typing import Mapping
 from warnings import warn
 
@@ -9,13 +11,16 @@ import cairocffi as cairo
 import pangocffi as pango
 import pangocairocffi as pc
 
-from bgfactory.common.config import bgfconfig
 from bgfactory.components.component import Component, DEBUG
 from bgfactory.components.constants import COLOR_BLACK, INFER, HALIGN_LEFT, VALIGN_TOP, \
-    HALIGN_CENTER, HALIGN_RIGHT, VALIGN_MIDDLE, VALIGN_BOTTOM, FILL
+    HALIGN_CENTER, HALIGN_RIGHT, VALIGN_MIDDLE, VALIGN_BOTTOM, FILL, FIT_SHRINK
 from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
 from bgfactory.components.shape import Rectangle
-from bgfactory.components.pango_helpers import PANGO_SCALE, convert_to_pango_align, convert_extents
+from bgfactory.components.pango_helpers import PANGO_SCALE, convert_to_pango_align, convert_extents, \
+    get_font_description
+from bgfactory.components.render_context import get_tolerance, get_render_context
+from bgfactory.components.render_report import add_surface, push_group, pop_group_to_source
+from bgfactory.components.text_layout_cache import text_layout_cache
 from bgfactory.common.profiler import profile
 from bgfactory.components.source import convert_source
 from bgfactory.components.utils import is_percent, parse_percent
@@ -23,6 +28,9 @@ from bgfactory.components.utils import is_percent, parse_percent
 
 SHOW_ME_DIMENSIONS = 'show_me_dimensions'
 
+# granularity of the font sizes tried by fit=FIT_SHRINK, in pixels
+FIT_SIZE_STEP = 0.5
+
 
 class FontDescription():
 
@@ -37,25 +45,41 @@ class FontDescription():
         
         self.family = family
         self.size = size
+        self.weight = weight
+        self.style = style
+        self.stretch = stretch
+        self.gravity = gravity
+
+        # created lazily, the pango object can't be pickled so it's not a part of the state
+        self._desc = None
 
-        font_desc = pango.FontDescription()
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_desc'] = None
+        return state
 
-        font_desc.family = family
-        font_desc.set_absolute_size(size * PANGO_SCALE)
-        font_desc.weight = weight
-        font_desc.style = style
-        font_desc.stretch = stretch
-        font_desc.gravity = gravity
+    def key(self):
+        """
+        :return: tuple identifying the font, used as a part of the keys of the text layout cache
+        """
+        return self.family, self.size, self.weight, self.style, self.stretch, self.gravity
 
-        self._desc = font_desc
+    def resized(self, size):
+        """
+        :return: copy of the font description with a different size
+        """
+        return FontDescription(self.family, size, self.weight, self.style, self.stretch, self.gravity)
     
     def get_pango_font_description(self):
+        if self._desc is None:
+            self._desc = get_font_description(*self.key())
+        
         return self._desc
 
 
 class _TextComponent(Component):
 
-    def __init__(self, x, y, w, h, text, halign, valign, yoffset, margin):
+    def __init__(self, x, y, w, h, text, halign, valign, yoffset, margin, fit, fit_min_size, fit_max_size):
         
         if not isinstance(text, str):
             # warn(f'text={text} is not string, converting by str()')
@@ -65,6 +89,13 @@ class _TextComponent(Component):
         self.yoffset = yoffset
         self.halign = halign
         self.valign = valign
+
+        if fit not in (None, FIT_SHRINK):
+            raise ValueError(f'unsupported {fit=}, allowed values: None, {FIT_SHRINK}')
+
+        self.fit = fit
+        self.fit_min_size = fit_min_size
+        self.fit_max_size = fit_max_size
         
         if w == FILL:
             raise ValueError('Width on a text component cannot be set to fill.'
@@ -74,9 +105,79 @@ class _TextComponent(Component):
         super(_TextComponent, self).__init__(x, y, w, h, margin)
 
     @abstractmethod
-    def _get_text_size(self, w, h):
+    def _get_text_size(self, w, h, size=None):
+        pass
+
+    @abstractmethod
+    def _setup_pc_layout(self, pc_layout, w, size=None):
+        pass
+
+    @abstractmethod
+    def _layout_key(self, w, size):
         pass
 
+    @abstractmethod
+    def _get_font_description(self):
+        pass
+
+    def _get_font(self, size):
+        """
+        :return: FontDescription of the text, resized to size unless it's None
+        """
+        font = self._get_font_description()
+        return font if size is None else font.resized(size)
+
+    def _get_layout(self, w, size=None):
+        """
+        :return: (pango layout, logical extents) of the text laid out to the width w, the layout is shaped once
+            and shared by all the components with the same text and style
+        """
+        key = self._layout_key(None if w is None else int(w), size)
+        return text_layout_cache.get(key, lambda pc_layout: self._setup_pc_layout(pc_layout, w, size))
+
+    def _get_fit_size(self, w, h):
+        """
+        :return: font size used to lay out the text into the box w x h, None to use the size of the font description
+        """
+        if self.fit is None or w is None or h is None:
+            return None
+        return self._memoize(('fit_size', w, h), self._search_fit_size, w, h)
+
+    def _search_fit_size(self, w, h):
+        # binary search for the largest size (in FIT_SIZE_STEPs from the min size) at which the text fits,
+        # every tried size is a single layout, cached by the text layout cache for the next components and renders
+        min_size = self.fit_min_size
+        max_size = self._get_font_description().size if self.fit_max_size is None else self.fit_max_size
+
+        def fits(size):
+            # the width of the layout itself, pango only exceeds it with words that can't be wrapped
+            _, (_, _, lw, _) = self._get_layout(w, size)
+            _, _, _, th = self._get_text_size(w, h, size)
+            return lw <= w and th + self.yoffset <= h
+
+        if max_size <= min_size or fits(max_size):
+            return max_size
+
+        lo, hi = 0, int((max_size - min_size) / FIT_SIZE_STEP)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if fits(min_size + mid * FIT_SIZE_STEP):
+                lo = mid
+            else:
+                hi = mid - 1
+
+        # when not even the min size fits, the min size is used and the text is cut off
+        return min_size + lo * FIT_SIZE_STEP
+    
+    def _measure_text(self, w, h):
+        size = self._get_fit_size(w, h)
+        # the text is laid out only according to the width, so h is not part of the key
+        return self._memoize(('text_size', w, size), self._profiled_text_size, w, h, size)
+
+    def _profiled_text_size(self, w, h, size):
+        with profile.section('text.measure'):
+            return self._get_text_size(w, h, size)
+
     def get_size(self):
         w, h = self.w, self.h
         
@@ -87,7 +188,7 @@ class _TextComponent(Component):
             fh = h
             
         # substitute in the dimensions that are known to infer the unknown ones
-        _, _, tw, th = self._get_text_size(fw, fh)
+        _, _, tw, th = self._measure_text(fw, fh)
 
         if w == INFER:
             w = tw
@@ -97,14 +198,12 @@ class _TextComponent(Component):
         return w, h
     
     @abstractmethod
-    def _draw(self, surface, x, y, w, h):
+    def _draw(self, cr, x, y, w, h):
         pass
     
-    def draw(self, w, h):
-
-        surface = super(_TextComponent, self).draw(w, h)
+    def _draw_contents(self, cr, w, h):
 
-        xoffset, yoffset, wtext, htext = self._get_text_size(w, h)
+        xoffset, yoffset, wtext, htext = self._measure_text(w, h)
         
         # print(self.text)
         # print(self._get_text_size(w, h))
@@ -142,9 +241,25 @@ class _TextComponent(Component):
             
         # print(self.halign, self.valign, x, y, xoffset, yoffset, wtext, htext)
         
-        self._draw(surface, x, y, w, h)
+        self._draw(cr, x, y, w, h)
 
-        return surface
+
+@lru_cache(maxsize=1024)
+def _find_replacements(markup, keys):
+    """
+    :param markup: pango markup
+    :param keys: keys of text_replace_map
+    :return: tuple of (start, end, key) of the occurrences of the keys in the plain text of the markup, in the
+        order of the text, longer keys take precedence over the shorter keys starting at the same character
+    """
+    keys = [key for key in keys if key]
+    if not keys:
+        return ()
+
+    text = ''.join(ElementTree.fromstring('<root>' + markup + '</root>').itertext())
+    pattern = re.compile('|'.join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+
+    return tuple((match.start(), match.end(), match.group()) for match in pattern.finditer(text))
 
 
 class TextMarkup(_TextComponent):
@@ -154,10 +269,10 @@ class TextMarkup(_TextComponent):
     
     You can escape reserved characters like in html/xml e.g &amp; &lt; &gt;
     """
-    dummy_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0, 0)
 
     def __init__(self, x, y, w, h, text, font_description=FontDescription(), spacing=0.115, halign=HALIGN_LEFT,
-                 valign=VALIGN_TOP, yoffset=0, text_replace_map: Mapping[str, Component]=None, margin=(0, 0, 0, 0)):
+                 valign=VALIGN_TOP, yoffset=0, text_replace_map: Mapping[str, Component]=None, margin=(0, 0, 0, 0),
+                 fit=None, fit_min_size=4, fit_max_size=None):
         """
         Initialize Text component that uses pango markup 
         (see https://developer.gnome.org/pygtk/stable/pango-markup-language.html).
@@ -182,6 +297,11 @@ class TextMarkup(_TextComponent):
          constrained by these dimensions but those are used as reference for FILL and n% of the glyphs. 
 
         :param margin: 
+        :param fit: FIT_SHRINK to lay out the text with the largest font size (between fit_min_size and fit_max_size)
+         at which it fits into the component, None to always use the size of the font description. Only the size
+         of the font description is changed, sizes set in the markup stay the same.
+        :param fit_min_size: the smallest font size tried by FIT_SHRINK
+        :param fit_max_size: the largest font size tried by FIT_SHRINK, the size of the font description by default
         """
         
         self.spacing = spacing
@@ -190,24 +310,28 @@ class TextMarkup(_TextComponent):
         self.text_replace_map = text_replace_map
         self.font_desc = font_description
         
-        super(TextMarkup, self).__init__(x, y, w, h, text, halign, valign, yoffset, margin)
+        super(TextMarkup, self).__init__(x, y, w, h, text, halign, valign, yoffset, margin, fit, fit_min_size,
+                                         fit_max_size)
         
-    def _draw(self, surface, x, y, w, h):
-        cr = cairo.Context(surface)
-
-        pc_layout = self._get_pc_layout(cr, w, h)
+    def _draw(self, cr, x, y, w, h):
+        pc_layout, _ = self._get_layout(w, self._get_fit_size(w, h))
 
-        profile('text.draw')
-        
         # print('draw ', x, y, w, h)
 
+        cr.save()
+        if self.text_replace_map:
+            # the replaced glyphs are cleared out with OPERATOR_CLEAR, isolate the text so that only the text
+            # gets cleared and not what's already drawn beneath it
+            push_group(cr)
+        
         cr.move_to(x, y)
-        pc.update_layout(cr, pc_layout)
+        # the layout is shaped for the measure context (see get_pango_context), it's drawn under the CTM of cr
         pc.show_layout(cr, pc_layout)
         if self.text_replace_map:
             self._draw_glyph_replacements(cr, pc_layout, x, y)
-        
-        profile()
+            pop_group_to_source(cr)
+            cr.paint()
+        cr.restore()
         
     def _draw_glyph_replacements(self, cr, pc_layout, base_x, base_y):
         # This method might not work on languages that do not flow from left to right 
@@ -231,127 +355,121 @@ class TextMarkup(_TextComponent):
         :return: 
         """
         
-        layout_iter = pc_layout.get_iter()
-        
-        text = self._xml_to_plaintext(self.text)
-        
-        replacements = [None] * len(text)
-        replacement_keys = [None] * len(text)
-        replacement_lengths = [0] * len(text)
-        
-        CONTINUE = 'continue'
-        END = 'end'
-        
-        for key in self.text_replace_map:
-            split = text.split(key)
-            
-            index = len(split[0])
-            
-            for part in split[1:]:
-                replacements[index] = self.text_replace_map[key]
-                replacement_keys[index] = key
-                replacement_lengths[index] = len(key)
-                index += len(part) + len(key)
-        
-        if not text:
+        matches = _find_replacements(self.text, tuple(self.text_replace_map))
+        if not matches:
             return
-        
+
+        layout_iter = pc_layout.get_iter()
         char_index = 0
-        
-        replacement_width = None
-        replacement_height = None
-        replacement_finish = None
-        replacement_x = None
-        replacement_y = None
-        
-        while True:
-            
-            # char = text[char_index]
+
+        for start, end, key in matches:
+            # only the matched characters are measured, the others are just skipped
+            while char_index < start:
+                if not layout_iter.next_char():
+                    return
+                char_index += 1
+
             ext = layout_iter.get_char_extents()
+            replacement_x = base_x + ext.x / PANGO_SCALE
+            replacement_y = base_y + ext.y / PANGO_SCALE
+            replacement_width = ext.width / PANGO_SCALE
+            replacement_height = ext.height / PANGO_SCALE
+
+            while char_index < end - 1:
+                if not layout_iter.next_char():
+                    return
+                char_index += 1
+
+                ext = layout_iter.get_char_extents()
+                replacement_width += ext.width / PANGO_SCALE
+                replacement_height = max(replacement_height, ext.height / PANGO_SCALE)
+
             y_baseline = base_y + layout_iter.get_baseline() / PANGO_SCALE
-            x, y, w, h = base_x + ext.x / PANGO_SCALE, base_y + ext.y / PANGO_SCALE, ext.width / PANGO_SCALE, ext.height / PANGO_SCALE
-            ink, log = layout_iter.get_cluster_extents()
 
-            # print(text[char_index], convert_extents(ext))
-            # print(text[char_index], convert_extents(ink), convert_extents(log))
-            
-            # print(convert_extents(ext2))
-            
-            if replacements[char_index]:
-                # print(layout_iter.get_index())
-                # print(x, y, w, h)
-                
-                replacement_glyph = replacements[char_index]
-                replacement_key = replacement_keys[char_index]
-                replacement_finish = char_index + replacement_lengths[char_index] - 1
-                
-                # print(replacement_glyph)
-                # print(replacement_finish)
-                
-                replacement_x = x
-                replacement_y = y
-                replacement_width = w
-                replacement_height = h
-            elif replacement_finish is not None:
-                replacement_width += w
-                replacement_height = max(replacement_height, h)
-            
-            if char_index == replacement_finish:
-                
-                cr.save()
-                # clear out the glyph area
-                cr.move_to(replacement_x, replacement_y)
-                cr.rectangle(replacement_x, replacement_y, replacement_width, replacement_height)
-                cr.set_operator(cairo.OPERATOR_CLEAR)
-                cr.set_tolerance(bgfconfig.tolerance)
-                cr.fill()
-                cr.restore()
-                
-                # it makes more sense to adjust the height to the baseline
-                replacement_height = y_baseline - replacement_y
-                
-                if replacement_glyph == SHOW_ME_DIMENSIONS:
-                    print('show me dimensions for: {}'.format(replacement_key))
-                    print('removed glyphs: x {}, y {}, w {}, h {}, y_baseline {}'.format(
-                        replacement_x, replacement_y, replacement_width, replacement_height, y_baseline))
-                    replacement_glyph = Rectangle(0, 0, FILL, FILL, stroke_width=3, stroke_src=(0.8, 0.3, 0.1, 0.5),
-                                                   fill_src=(0.3, 0.5, 0.5, 0.5))
-                
-                w, h = replacement_glyph.get_size()
-                if w == FILL:
-                    w = '100%'
-                if is_percent(w):
-                    w = replacement_width * parse_percent(w)
-                if h == FILL:
-                    h = '100%'
-                if is_percent(h):
-                    h = replacement_height * parse_percent(h)
-                
-                # print(replacement_width, replacement_height, w, h)
-                
-                surface = replacement_glyph.draw(w, h)
-                
-                # place the glyph on the line baseline to the middle of the removed glyph,
-                # the glyph x,y coordinates are used as an offset
-                x_glyph = replacement_x + replacement_width / 2 - w / 2 + replacement_glyph.x
-                
-                y_glyph = y_baseline - h + replacement_glyph.y
-                
-                # print(y_baseline)
-                # print(h)
-                # print(y_glyph)
-
-                cr.set_source_surface(surface, x_glyph, y_glyph)
-                cr.set_tolerance(bgfconfig.tolerance)
-                cr.paint()
-                
-                replacement_glyph = None
-                replacement_finish = None
-            
+            cr.save()
+            # clear out the glyph area
+            cr.move_to(replacement_x, replacement_y)
+            cr.rectangle(replacement_x, replacement_y, replacement_width, replacement_height)
+            cr.set_operator(cairo.OPERATOR_CLEAR)
+            cr.set_tolerance(get_tolerance())
+            cr.fill()
+            cr.restore()
+
+            # it makes more sense to adjust the height to the baseline
+            replacement_height = y_baseline - replacement_y
+
+            replacement_glyph = self.text_replace_map[key]
+            if replacement_glyph == SHOW_ME_DIMENSIONS:
+                print('show me dimensions for: {}'.format(key))
+                print('removed glyphs: x {}, y {}, w {}, h {}, y_baseline {}'.format(
+                    replacement_x, replacement_y, replacement_width, replacement_height, y_baseline))
+                replacement_glyph = Rectangle(0, 0, FILL, FILL, stroke_width=3, stroke_src=(0.8, 0.3, 0.1, 0.5),
+                                              fill_src=(0.3, 0.5, 0.5, 0.5))
+
+            w, h = replacement_glyph.measure()
+            if w == FILL:
+                w = '100%'
+            if is_percent(w):
+                w = replacement_width * parse_percent(w)
+            if h == FILL:
+                h = '100%'
+            if is_percent(h):
+                h = replacement_height * parse_percent(h)
+
+            # place the glyph on the line baseline to the middle of the removed glyph,
+            # the glyph x,y coordinates are used as an offset
+            x_glyph = replacement_x + replacement_width / 2 - w / 2 + replacement_glyph.x
+            y_glyph = y_baseline - h + replacement_glyph.y
+
+            self._draw_replacement_glyph(cr, replacement_glyph, x_glyph, y_glyph, w, h)
+
             char_index += 1
-            
             if not layout_iter.next_char():
-                break
+                return
+
+    def _draw_replacement_glyph(self, cr, glyph, x, y, w, h):
+        """
+        Draw the glyph, when the render has a raster cache the glyph is rasterized once per size and sub-pixel
+        offset (with hinted fonts, the occurrences on a line mostly share the offset) and then only painted
+        """
+        context = get_render_context()
+        xx, yx, xy, yy, _, _ = cr.get_matrix().as_tuple()
+
+        if context is None or context.raster_cache is None or context.caching_depth > 0 or \
+                (xx, yx, xy, yy) != (1, 0, 0, 1):
+            glyph.draw_into(cr, x, y, w, h)
+            return
+
+        structural_hash = glyph.structural_hash()
+        if structural_hash is None:
+            glyph.draw_into(cr, x, y, w, h)
+            return
+
+        # keep the sub-pixel offset of the glyph, so that it's rasterized exactly as if drawn directly
+        dx, dy = cr.user_to_device(x, y)
+        ox, oy = dx - floor(dx), dy - floor(dy)
+        key = ('glyph', structural_hash, w, h, ox, oy) + context.pixel_key()
+
+        raster_cache = context.raster_cache
+        surface = raster_cache.get(key)
+        if surface is None:
+            if not raster_cache.should_store(key):
+                glyph.draw_into(cr, x, y, w, h)
+                return
+
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(ceil(ox + w)), int(ceil(oy + h)))
+            add_surface(surface)
+            context.caching_depth += 1
+            try:
+                glyph.draw_into(cairo.Context(surface), ox, oy, w, h)
+            finally:
+                context.caching_depth -= 1
+            raster_cache.put(key, surface)
+
+        cr.save()
+        cr.set_source_surface(surface, x - ox, y - oy)
+        cr.paint()
+        cr.restore()
 
     # def _get_pc_layout(self, cr, w, h):
     #     pc_layout = pc.create_layout(cr)
@@ -365,42 +483,42 @@ class TextMarkup(_TextComponent):
     #
     #     return pc_layout
 
-    def _get_pc_layout(self, cr, w, h):
-        pc_layout = pc.create_layout(cr)
+    def _setup_pc_layout(self, pc_layout, w, size=None):
+        font = self._get_font(size)
+
         if w is not None:
             pc_layout.width = int(w) * PANGO_SCALE
-        pc_layout.font_description = self.font_desc._desc
+        pc_layout.font_description = font.get_pango_font_description()
         pc_layout.apply_markup(self.text)
-        pc_layout.spacing = int(self.spacing * self.font_desc.size * PANGO_SCALE)
+        pc_layout.spacing = int(self.spacing * font.size * PANGO_SCALE)
         pc_layout.alignment = convert_to_pango_align(self.halign)
 
-        return pc_layout
-
-    def _get_text_size(self, w, h):
-        cr = cairo.Context(TextUniform.dummy_surface)
-        pc_layout = self._get_pc_layout(cr, w, h)
+    def _get_font_description(self):
+        return self.font_desc
 
-        ink, logical = pc_layout.get_extents()
+    def _layout_key(self, w, size):
+        return 'markup', self.text, self._get_font(size).key(), w, self.spacing, self.halign
 
-        # print(ink.x / PANGO_SCALE, ink.y / PANGO_SCALE, ink.width / PANGO_SCALE, ink.height / PANGO_SCALE)
-        # print(logical.x / PANGO_SCALE, logical.y / PANGO_SCALE, logical.width / PANGO_SCALE, logical.height / PANGO_SCALE)
+    def _get_text_size(self, w, h, size=None):
+        _, logical = self._get_layout(w, size)
+        return logical
 
-        return logical.x / PANGO_SCALE, logical.y / PANGO_SCALE, logical.width / PANGO_SCALE, logical.height / PANGO_SCALE
 
-    def _xml_to_plaintext(self, text):
-        return ''.join(ElementTree.fromstring('<root>' + text + '</root>').itertext())
-    
-    
 class TextUniform(_TextComponent):
     """
     A basic Text component that assumes uniform text style. Allows for text outline,
     for making pretty titles etc.
     """
-    dummy_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1000, 1000)
-    
     def __init__(self, x, y, w, h, text, font_description=FontDescription(), spacing=0.115, halign=HALIGN_LEFT,
                  valign=VALIGN_TOP, fill_src=COLOR_BLACK, stroke_width=0, stroke_src=None,
-                 outline_line_join=cairo.LINE_JOIN_MITER, yoffset=0, margin=(0,0,0,0)):
+                 outline_line_join=cairo.LINE_JOIN_MITER, yoffset=0, margin=(0,0,0,0), fit=None, fit_min_size=4,
+                 fit_max_size=None):
+        """
+        :param fit: FIT_SHRINK to lay out the text with the largest font size (between fit_min_size and fit_max_size)
+         at which it fits into the component, None to always use the size of the font description
+        :param fit_min_size: the smallest font size tried by FIT_SHRINK
+        :param fit_max_size: the largest font size tried by FIT_SHRINK, the size of the font description by default
+        """
         
         self.font_description = font_description
         self.fill_src = convert_source(fill_src)
@@ -409,58 +527,74 @@ class TextUniform(_TextComponent):
         self.spacing = spacing
         self.outline_line_join = outline_line_join
         
-        super(TextUniform, self).__init__(round(x), round(y), w, h, text, halign, valign, yoffset, margin)
+        super(TextUniform, self).__init__(round(x), round(y), w, h, text, halign, valign, yoffset, margin, fit,
+                                          fit_min_size, fit_max_size)
         
-    def _draw(self, surface, x, y, w, h):
+    def _draw(self, cr, x, y, w, h):
         
-        cr = cairo.Context(surface)
-        
-        pc_layout = self._get_pc_layout(cr, w, h)
+        pc_layout, _ = self._get_layout(w, self._get_fit_size(w, h))
 
-        profile('text.draw')
-        if(self.stroke_src is not None):
+        path = None
+        if self.stroke_src is not None:
+            # the outline and the fill use the same glyph outlines, convert the layout into a path only once
+            # and replay it for both
+            cr.new_path()
             cr.move_to(x, y)
+            pc.layout_path(cr, pc_layout)
+            cr.close_path()
+            path = cr.copy_path()
+            cr.new_path()
+
+        cr.save()
+        if(self.stroke_src is not None):
+            # the fill replaces the inner half of the outline with OPERATOR_SOURCE, isolate the text so that
+            # it doesn't replace what's already drawn beneath it
+            push_group(cr)
             cr.set_line_width(self.stroke_width * 2)
             self.stroke_src.set(cr, 0, 0, w, h)
             cr.set_line_join(self.outline_line_join)
-            pc.update_layout(cr, pc_layout)
-            pc.layout_path(cr, pc_layout)
-            cr.close_path()
+            cr.append_path(path)
             cr.stroke()
 
         cr.save()
-        cr.move_to(x, y)
         self.fill_src.set(cr, 0, 0, w, h)
-        cr.set_operator(cairo.OPERATOR_SOURCE)
-        pc.update_layout(cr, pc_layout)
-        pc.layout_path(cr, pc_layout)
-        cr.set_tolerance(bgfconfig.tolerance)
-        cr.close_path()
+        if self.stroke_src is not None:
+            cr.set_operator(cairo.OPERATOR_SOURCE)
+            cr.append_path(path)
+        else:
+            cr.move_to(x, y)
+            pc.layout_path(cr, pc_layout)
+            cr.close_path()
+        cr.set_tolerance(get_tolerance())
         cr.fill()
         cr.restore()
-        profile()
         
-    def _get_pc_layout(self, cr, w, h):
-        pc_layout = pc.create_layout(cr)
+        if self.stroke_src is not None:
+            pop_group_to_source(cr)
+            cr.paint()
+        cr.restore()
+        
+    def _setup_pc_layout(self, pc_layout, w, size=None):
+        font = self._get_font(size)
+
         if w is not None:
             pc_layout.width = int(w) * PANGO_SCALE
-        pc_layout.font_description = self.font_description._desc
+        pc_layout.font_description = font.get_pango_font_description()
         pc_layout.text = self.text
-        pc_layout.spacing = int(self.spacing * self.font_description.size * PANGO_SCALE)
+        pc_layout.spacing = int(self.spacing * font.size * PANGO_SCALE)
         pc_layout.alignment = convert_to_pango_align(self.halign)
         
-        return pc_layout
-        
-    def _get_text_size(self, w, h):
-        cr = cairo.Context(TextUniform.dummy_surface)
-        pc_layout = self._get_pc_layout(cr, w, h)
+    def _get_font_description(self):
+        return self.font_description
+
+    def _layout_key(self, w, size):
+        return 'text', self.text, self._get_font(size).key(), w, self.spacing, self.halign
 
-        ink, logical = pc_layout.get_extents()
-        # pc_layout.get_iter()
+    def _get_text_size(self, w, h, size=None):
+        _, (lx, ly, lw, lh) = self._get_layout(w, size)
         
-        return logical.x / PANGO_SCALE - self.stroke_width, logical.y / PANGO_SCALE - self.stroke_width, \
-               logical.width / PANGO_SCALE * 1.021 + 2 * self.stroke_width, \
-               logical.height / PANGO_SCALE + 2 * self.stroke_width
+        return lx - self.stroke_width, ly - self.stroke_width, lw * 1.021 + 2 * self.stroke_width, \
+               lh + 2 * self.stroke_width
     
 if __name__ == '__main__':
     bg = Rectangle(0, 0, 400, 400, layout=VerticalFlowLayout(HALIGN_CENTER))
@@ -0,0 +1,163 @@
+import threading
+
+import pangocairocffi as pc
+
+from bgfactory.components.component import Component
+from bgfactory.components.constants import HALIGN_LEFT
+from bgfactory.components.pango_helpers import PANGO_SCALE, convert_to_pango_align, get_measure_context
+from bgfactory.components.text import FontDescription
+
+
+class TextFlow:
+    """
+    A long markup text (e.g. the rules of a rulebook) flowed through a chain of frames - columns, grid cells,
+    pages. The text is shaped once for the whole flow and every frame takes the next lines that fit into it,
+    so laying out a long document is linear in its length, no matter the number of frames.
+
+    All the frames of a flow have the same width, the width the text is shaped to.
+
+        flow = TextFlow(rules, w=1200, font_description=FontDescription(size=32))
+        for frame in flow.frames(1600):
+            page = Rectangle(0, 0, 1300, 1700, padding=(50, 50, 50, 50))
+            page.add(frame)
+            page.image().save(...)
+    """
+
+    def __init__(self, text, w, font_description=FontDescription(), spacing=0.115, halign=HALIGN_LEFT):
+        """
+        :param text: pango markup of the whole text
+        :param w: width of the frames
+        :param font_description: default font of the text
+        :param spacing: space between the lines relative to the font size
+        :param halign: horizontal align of the lines
+        """
+        self.text = text
+        self.w = w
+        self.font_description = font_description
+        self.spacing = spacing
+        self.halign = halign
+
+        self._layout = None
+        self._lines = None
+        self._next_line = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # the pango layout can't be pickled, it's shaped again when a frame is drawn
+        state = self.__dict__.copy()
+        state['_layout'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def structural_key(self):
+        return self.text, self.w, self.font_description.key(), self.spacing, self.halign
+
+    @property
+    def finished(self):
+        """
+        True when all the lines were given to frames
+        """
+        return self._next_line >= len(self._get_lines())
+
+    def next_frame(self, h, x=0, y=0, margin=(0, 0, 0, 0)):
+        """
+        :param h: height of the frame, it gets the following lines that fit into it (at least one line)
+        :return: TextFrame with the following lines of the text or None if all the lines were already given out
+        """
+        lines = self._get_lines()
+        start = self._next_line
+        if start >= len(lines):
+            return None
+
+        top = lines[start][0]
+        end = start + 1
+        while end < len(lines) and lines[end][1] - top <= h:
+            end += 1
+
+        self._next_line = end
+        return TextFrame(x, y, self.w, h, self, start, end, margin)
+
+    def frames(self, h, x=0, y=0, margin=(0, 0, 0, 0)):
+        """
+        Generate frames of the same height until the whole text is given out, a frame is created only when
+        it's requested, so the pages can be saved as they fill
+        """
+        while True:
+            frame = self.next_frame(h, x, y, margin)
+            if frame is None:
+                return
+            yield frame
+
+    def _get_layout(self):
+        if self._layout is None:
+            # a pango context of its own, the frames of a flow may be drawn by different threads
+            layout = pc.create_layout(get_measure_context())
+            layout.width = int(self.w) * PANGO_SCALE
+            layout.font_description = self.font_description.get_pango_font_description()
+            layout.apply_markup(self.text)
+            layout.spacing = int(self.spacing * self.font_description.size * PANGO_SCALE)
+            layout.alignment = convert_to_pango_align(self.halign)
+            self._layout = layout
+
+        return self._layout
+
+    def _get_lines(self):
+        """
+        :return: list of (top, bottom) of the lines in the coordinates of the layout
+        """
+        if self._lines is None:
+            with self._lock:
+                layout_iter = self._get_layout().get_iter()
+                lines = []
+                while True:
+                    top, bottom = layout_iter.get_line_yrange()
+                    lines.append((top / PANGO_SCALE, bottom / PANGO_SCALE))
+                    if not layout_iter.next_line():
+                        break
+                self._lines = lines
+
+        return self._lines
+
+    def _draw_lines(self, cr, start, end):
+        lines = self._get_lines()
+        top, bottom = lines[start][0], lines[end - 1][1]
+
+        cr.save()
+        # only the lines of the frame, not the top of the next line
+        cr.rectangle(0, 0, self.w, bottom - top)
+        cr.clip()
+        cr.move_to(0, -top)
+        # the layout is shaped once for all the frames, the lines outside of the clip are culled by cairo.
+        # It's not updated for cr, the lines keep the breaks measured by _get_lines() under any transformation.
+        # Pango layouts can't be drawn from more threads at once
+        with self._lock:
+            pc.show_layout(cr, self._get_layout())
+        cr.restore()
+
+
+class TextFrame(Component):
+    """
+    A frame showing a range of lines of a TextFlow, created by TextFlow.next_frame() or TextFlow.frames()
+    """
+
+    def __init__(self, x, y, w, h, flow, start_line, end_line, margin=(0, 0, 0, 0)):
+        """
+        :param flow: TextFlow the lines belong to
+        :param start_line: index of the first line shown in the frame
+        :param end_line: index after the last line shown in the frame
+        """
+        self.flow = flow
+        self.start_line = start_line
+        self.end_line = end_line
+
+        super(TextFrame, self).__init__(x, y, w, h, margin)
+
+    def get_size(self):
+        return self.w, self.h
+
+    def _draw_contents(self, cr, w, h):
+        self.flow._draw_lines(cr, self.start_line, self.end_line)
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+from bgfactory.components.pango_helpers import PANGO_SCALE, create_layout
+
+
+class TextLayoutCache:
+    """
+    LRU cache of shaped pango layouts and their logical extents, so that the same text with the same font,
+    width, spacing and alignment (e.g. the same label on every card of a deck) is shaped only once and then
+    reused for measuring and drawing.
+
+    The cache creates the layouts in the fixed pango context of the thread (see pango_helpers.get_pango_context)
+    and they must not be pc.update_layout()-ed for a draw target, so the cached extents are always the ones
+    the layout is drawn with.
+
+    Pango layouts can't be used from more threads at once, so every thread has its own entries,
+    max_entries bounds the entries of each thread. The text components use the module-level
+    text_layout_cache, set its max_entries to 0 to disable it.
+    """
+
+    def __init__(self, max_entries=1024):
+        """
+        :param max_entries: number of layouts kept per thread
+        """
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self, key, setup):
+        """
+        :param key: hashable description of everything setup() puts into the layout
+        :param setup: function(layout) setting the text and the style of a new pango layout, called on a miss
+        :return: (layout, logical extents (x, y, w, h))
+        """
+        entries = self._entries()
+
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+            with self._lock:
+                self.hits += 1
+            return entry
+
+        layout = create_layout()
+        setup(layout)
+        _, logical = layout.get_extents()
+        entry = layout, (logical.x / PANGO_SCALE, logical.y / PANGO_SCALE, logical.width / PANGO_SCALE,
+                         logical.height / PANGO_SCALE)
+
+        with self._lock:
+            self.misses += 1
+
+        if self.max_entries > 0:
+            entries[key] = entry
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+        return entry
+
+    def clear(self):
+        """
+        Clear the entries of the calling thread
+        """
+        self._entries().clear()
+
+    def stats(self):
+        """
+        :return: dict with the counters of the cache, entries are the ones of the calling thread
+        """
+        return dict(hits=self.hits, misses=self.misses, entries=len(self._entries()), max_entries=self.max_entries)
+
+    def _entries(self):
+        entries = getattr(self._local, 'entries', None)
+        if entries is None:
+            entries = self._local.entries = OrderedDict()
+        return entries
+
+
+text_layout_cache = TextLayoutCache()
@@ -0,0 +1,50 @@
+from math import ceil, floor
+
+import cairocffi as cairo
+
+from bgfactory.components.cairo_helpers import is_pixel_aligned
+from bgfactory.components.render_context import get_render_context, use_render_context
+from bgfactory.components.render_report import add_surface, track, DRAW
+
+
+def draw_children(cr, placements):
+    """
+    Draw the children of a container into cr. When the render has a thread_pool, the children are rasterized
+    concurrently into surfaces of their own (cairo and pango release the GIL while drawing) and then composited
+    in order. Otherwise, or when cr is not pixel aligned (the composited children wouldn't match the directly
+    drawn ones), they are drawn one by one directly into cr.
+    :param cr: context translated to the top-left corner of the container
+    :param placements: list of (child, x, y, w, h) in the order in which the children are drawn
+    """
+    context = get_render_context()
+
+    if context is None or context.thread_pool is None or len(placements) < 2 or not is_pixel_aligned(cr):
+        for child, x, y, w, h in placements:
+            child.draw_into(cr, x, y, w, h)
+        return
+
+    tasks = []
+    for child, x, y, w, h in placements:
+        # keep the sub-pixel offset of the child, so that it's rasterized exactly as if drawn directly
+        dx, dy = cr.user_to_device(x, y)
+        ox, oy = dx - floor(dx), dy - floor(dy)
+        tasks.append((x - ox, y - oy, context.thread_pool.submit(_rasterize, context.fork(), child, ox, oy, w, h)))
+
+    for x, y, task in tasks:
+        surface = task.result()
+        cr.save()
+        cr.set_source_surface(surface, x, y)
+        cr.paint()
+        cr.restore()
+
+
+def _rasterize(context, child, x, y, w, h):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(ceil(x + w)), int(ceil(y + h)))
+
+    # the surface is charged to the child, draw_into() continues its tracked draw
+    with use_render_context(context), track(child, DRAW):
+        add_surface(surface)
+        cr = cairo.Context(surface)
+        child.draw_into(cr, x, y, w, h)
+
+    return surface
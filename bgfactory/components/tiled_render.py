@@ -0,0 +1,226 @@
+import struct
+import zlib
+from math import ceil
+from pathlib import Path
+
+import cairocffi as cairo
+import numpy as np
+
+from bgfactory.components.cairo_helpers import array_from_surface
+from bgfactory.components.render_context import render_context
+from bgfactory.components.utils import MM_PER_INCH
+
+
+FORMAT_PNG = 'png'
+FORMAT_TIFF = 'tiff'
+FORMAT_RAW = 'raw'
+
+_SUFFIX_FORMATS = {
+    '.png': FORMAT_PNG,
+    '.tif': FORMAT_TIFF,
+    '.tiff': FORMAT_TIFF,
+    '.raw': FORMAT_RAW,
+    '.rgba': FORMAT_RAW,
+    '.rgb': FORMAT_RAW,
+}
+
+
+def render_tiled(component, path, format=None, mode='RGBA', strip_height=256, dpi=None, **render_options):
+    """
+    Render a component that is too large to be rendered at once (e.g. a game board) in horizontal strips
+    and stream them into a file. Only one strip is held in memory, so the memory depends on the strip size
+    and not on the size of the component.
+
+    The component is drawn into each strip clipped to the strip, the components that fall outside
+    of the strip are skipped by cairo. The measured sizes are shared by all the strips.
+
+    :param component: component to render
+    :param path: path of the output file
+    :param format: FORMAT_PNG, FORMAT_TIFF (uncompressed) or FORMAT_RAW (just the pixels, row by row),
+        None picks the format by the suffix of the path
+    :param mode: 'RGBA' or 'RGB'
+    :param strip_height: number of rows rendered at once
+    :param dpi: resolution stored in the file (PNG and TIFF), None to leave it out
+    :param render_options: options of the render, see RenderContext
+    :return: (w, h) of the rendered image
+    """
+    path = Path(path)
+
+    if format is None:
+        format = _SUFFIX_FORMATS.get(path.suffix.lower())
+        if format is None:
+            raise ValueError(f'can\'t infer the format from {path=}, set the format explicitly')
+
+    writers = {FORMAT_PNG: _PNGWriter, FORMAT_TIFF: _TIFFWriter, FORMAT_RAW: _RawWriter}
+    if format not in writers:
+        raise ValueError(f'unknown {format=}, allowed values: {", ".join(writers)}')
+    if mode not in ('RGBA', 'RGB'):
+        raise ValueError(f'unsupported {mode=}, allowed values: RGBA, RGB')
+
+    with render_context(**render_options):
+        w, h = component.measure()
+        w, h = int(ceil(w)), int(ceil(h))
+
+        with open(path, 'wb') as f:
+            writer = writers[format](f, w, h, mode, strip_height, dpi)
+
+            for y in range(0, h, strip_height):
+                rows = min(strip_height, h - y)
+
+                surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, rows)
+                cr = cairo.Context(surface)
+                cr.translate(0, -y)
+                component.draw_into(cr, 0, 0, w, h)
+
+                writer.write_rows(array_from_surface(surface, mode))
+
+                del cr, surface
+
+            writer.close()
+
+    return w, h
+
+
+class _RawWriter:
+
+    def __init__(self, f, w, h, mode, strip_height, dpi):
+        self.f = f
+
+    def write_rows(self, pixels):
+        self.f.write(pixels.tobytes())
+
+    def close(self):
+        pass
+
+
+class _PNGWriter:
+    """
+    Writes the rows into a PNG as they come, compressed into IDAT chunks on the fly
+    """
+
+    def __init__(self, f, w, h, mode, strip_height, dpi):
+        self.f = f
+        self.compressor = zlib.compressobj(6)
+
+        color_type = 6 if mode == 'RGBA' else 2
+        f.write(b'\x89PNG\r\n\x1a\n')
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, color_type, 0, 0, 0))
+
+        if dpi is not None:
+            pixels_per_metre = int(round(dpi / MM_PER_INCH * 1000))
+            self._write_chunk(b'pHYs', struct.pack('>IIB', pixels_per_metre, pixels_per_metre, 1))
+
+    def write_rows(self, pixels):
+        h = pixels.shape[0]
+
+        # every row starts with the filter type, 0 = no filter
+        rows = np.zeros((h, pixels.shape[1] * pixels.shape[2] + 1), dtype=np.uint8)
+        rows[:, 1:] = pixels.reshape(h, -1)
+
+        data = self.compressor.compress(rows.tobytes())
+        if data:
+            self._write_chunk(b'IDAT', data)
+
+    def close(self):
+        self._write_chunk(b'IDAT', self.compressor.flush())
+        self._write_chunk(b'IEND', b'')
+
+    def _write_chunk(self, chunk_type, data):
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(chunk_type)
+        self.f.write(data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+class _TIFFWriter:
+    """
+    Writes an uncompressed little-endian TIFF, the header and the strip offsets are known upfront
+    so the rows are written as they come
+    """
+
+    _SHORT = 3
+    _LONG = 4
+    _RATIONAL = 5
+
+    def __init__(self, f, w, h, mode, strip_height, dpi):
+        self.f = f
+
+        channels = len(mode)
+        row_bytes = w * channels
+        strip_count = max(1, ceil(h / strip_height))
+
+        strip_byte_counts = [min(strip_height, h - i * strip_height) * row_bytes for i in range(strip_count)]
+
+        entries = [
+            (256, self._LONG, [w]),
+            (257, self._LONG, [h]),
+            (258, self._SHORT, [8] * channels),
+            (259, self._SHORT, [1]),  # no compression
+            (262, self._SHORT, [2]),  # RGB
+            (273, self._LONG, [0] * strip_count),  # strip offsets, filled in below
+            (277, self._SHORT, [channels]),
+            (278, self._LONG, [strip_height]),
+            (279, self._LONG, strip_byte_counts),
+        ]
+        if dpi is not None:
+            entries += [
+                (282, self._RATIONAL, [(int(round(dpi * 100)), 100)]),
+                (283, self._RATIONAL, [(int(round(dpi * 100)), 100)]),
+            ]
+        entries.append((284, self._SHORT, [1]))  # chunky planar configuration
+        if dpi is not None:
+            entries.append((296, self._SHORT, [2]))  # resolution in inches
+        if mode == 'RGBA':
+            entries.append((338, self._SHORT, [2]))  # unassociated alpha
+
+        ifd_offset = 8
+        ifd_size = 2 + 12 * len(entries) + 4
+        values_offset = ifd_offset + ifd_size
+
+        # values that don't fit into the 4 bytes of an entry are stored after the IFD
+        values_size = sum(self._values_size(t, v) for _, t, v in entries if self._values_size(t, v) > 4)
+        data_offset = values_offset + values_size
+
+        if data_offset + sum(strip_byte_counts) >= 2 ** 32:
+            raise ValueError('the image is too large for a TIFF file, use FORMAT_RAW')
+
+        strip_offsets = []
+        offset = data_offset
+        for count in strip_byte_counts:
+            strip_offsets.append(offset)
+            offset += count
+        entries[5] = (273, self._LONG, strip_offsets)
+
+        header = bytearray(struct.pack('<2sHI', b'II', 42, ifd_offset))
+        header += struct.pack('<H', len(entries))
+
+        values = bytearray()
+        for tag, value_type, value in entries:
+            packed = self._pack_values(value_type, value)
+            if len(packed) <= 4:
+                header += struct.pack('<HHI', tag, value_type, len(value)) + packed.ljust(4, b'\0')
+            else:
+                header += struct.pack('<HHII', tag, value_type, len(value), values_offset + len(values))
+                values += packed
+        header += struct.pack('<I', 0)  # no next IFD
+
+        f.write(header)
+        f.write(values)
+
+    def write_rows(self, pixels):
+        self.f.write(pixels.tobytes())
+
+    def close(self):
+        pass
+
+    @classmethod
+    def _values_size(cls, value_type, value):
+        return len(cls._pack_values(value_type, value))
+
+    @classmethod
+    def _pack_values(cls, value_type, value):
+        if value_type == cls._SHORT:
+            return struct.pack(f'<{len(value)}H', *value)
+        if value_type == cls._LONG:
+            return struct.pack(f'<{len(value)}I', *value)
+        return b''.join(struct.pack('<II', numerator, denominator) for numerator, denominator in value)
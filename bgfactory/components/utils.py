@@ -21,12 +21,17 @@ A4_WIDTH_MM = 210
 A4_HEIGHT_MM = 297
 
 MM_PER_INCH = 25.4
+POINTS_PER_INCH = 72
 
 
 def mm_to_pixels(mm, dpi=300):
     return int(mm / MM_PER_INCH * dpi)
 
 
+def mm_to_points(mm):
+    return mm / MM_PER_INCH * POINTS_PER_INCH
+
+
 def get_a4_pixel_size(dpi=300):
     return mm_to_pixels(A4_WIDTH_MM, dpi), mm_to_pixels(A4_HEIGHT_MM, dpi)
 
@@ -1,15 +1,62 @@
+"""
+The public API of bgfactory in a single namespace, use as
+
+    from bgfactory import ff
+
+The constants are imported right away, everything else is imported on first access, so that importing ff
+doesn't load cairo, pango, numpy and PIL until they are needed.
+"""
+from importlib import import_module
 
-from bgfactory.components.component import Component, Container
 from bgfactory.components.constants import *
-from bgfactory.components.layout.absolute_layout import AbsoluteLayout
-from bgfactory.components.layout.layout_manager import LayoutManager, LayoutError
-from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
-from bgfactory.components.layout.horizontal_flow_layout import HorizontalFlowLayout
-from bgfactory.components.cairo_helpers import image_from_surface
-from bgfactory.components.card_sheet import CardSheet, make_printable_sheets
-from bgfactory.components.grid import Grid, GridCell, GridError
-from bgfactory.components.shape import Shape, Rectangle, Circle, RoundedRectangle, Line
-from bgfactory.components.regular_polygon import RegularPolygon
-from bgfactory.components.source import PNGSource, RGBSource, RGBASource, Source, AUTO, convert_source
-from bgfactory.components.text import TextMarkup, TextUniform, FontDescription
-from bgfactory.components.utils import A4_WIDTH_MM, MM_PER_INCH, A4_HEIGHT_MM, mm_to_pixels, get_a4_pixel_size, hex_color_to_rgba
\ No newline at end of file
+from bgfactory.components import constants as _constants
+
+
+_LAZY = {
+    'bgfactory.components.component': ['Component', 'Container'],
+    'bgfactory.components.layout.absolute_layout': ['AbsoluteLayout'],
+    'bgfactory.components.layout.layout_manager': ['LayoutManager', 'LayoutError'],
+    'bgfactory.components.layout.vertical_flow_layout': ['VerticalFlowLayout'],
+    'bgfactory.components.layout.horizontal_flow_layout': ['HorizontalFlowLayout'],
+    'bgfactory.components.cairo_helpers': [
+        'image_from_surface', 'array_from_surface', 'surface_to_array', 'surface_from_image'],
+    'bgfactory.components.card_sheet': [
+        'CardSheet', 'make_printable_sheets', 'iter_printable_sheets', 'make_printable_pdf', 'CardRenderError'],
+    'bgfactory.components.grid': ['Grid', 'GridCell', 'GridError'],
+    'bgfactory.components.shape': ['Shape', 'Rectangle', 'Circle', 'RoundedRectangle', 'Line'],
+    'bgfactory.components.regular_polygon': ['RegularPolygon'],
+    'bgfactory.components.source': ['PNGSource', 'ImageSource', 'PackSource', 'RGBSource', 'RGBASource', 'Source', 'AUTO', 'convert_source'],
+    'bgfactory.components.text': ['TextMarkup', 'TextUniform', 'FontDescription'],
+    'bgfactory.components.text_layout_cache': ['TextLayoutCache', 'text_layout_cache'],
+    'bgfactory.components.text_flow': ['TextFlow', 'TextFrame'],
+    'bgfactory.components.utils': [
+        'A4_WIDTH_MM', 'MM_PER_INCH', 'A4_HEIGHT_MM', 'POINTS_PER_INCH', 'mm_to_pixels', 'mm_to_points',
+        'get_a4_pixel_size', 'hex_color_to_rgba'],
+    'bgfactory.components.raster_cache': ['RasterCache'],
+    'bgfactory.components.asset_cache': ['AssetCache', 'asset_cache'],
+    'bgfactory.components.asset_pack': ['AssetPack', 'compile_asset_pack'],
+    'bgfactory.components.shared_asset_cache': ['SharedAssetCache'],
+    'bgfactory.components.render_context': ['render_context'],
+    'bgfactory.components.disk_cache': ['DiskCache'],
+    'bgfactory.components.render_report': ['RenderReport'],
+    'bgfactory.components.tiled_render': ['render_tiled', 'FORMAT_PNG', 'FORMAT_TIFF', 'FORMAT_RAW'],
+}
+
+_MODULES = {name: module for module, names in _LAZY.items() for name in names}
+
+__all__ = [name for name in dir(_constants) if not name.startswith('_')] + list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(import_module(module), name)
+    # cache it, the next access doesn't go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))
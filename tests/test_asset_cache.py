@@ -0,0 +1,79 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import cairocffi as cairo
+from PIL import Image
+
+from bgfactory.components.asset_cache import AssetCache, asset_cache
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.source import PNGSource
+
+
+class TestAssetCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'background.png'
+        Image.new('RGBA', (40, 30), (200, 10, 10, 255)).save(self.path)
+        asset_cache.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_decoded_once_across_renders(self):
+        misses = asset_cache.misses
+
+        for _ in range(5):
+            Rectangle(0, 0, 80, 60, fill_src=PNGSource(self.path)).image()
+
+        self.assertEqual(asset_cache.misses - misses, 1)
+        self.assertGreaterEqual(asset_cache.hits, 4)
+
+        # other sizes are scaled from the same decoded image
+        Rectangle(0, 0, 100, 60, fill_src=PNGSource(self.path)).image()
+        self.assertEqual(asset_cache.misses - misses, 1)
+
+    def test_changed_file_is_decoded_again(self):
+        Rectangle(0, 0, 80, 60, fill_src=PNGSource(self.path)).image()
+        misses = asset_cache.misses
+
+        Image.new('RGBA', (50, 30), (10, 200, 10, 255)).save(self.path)
+        os.utime(self.path, ns=(0, 10 ** 9))
+        Rectangle(0, 0, 80, 60, fill_src=PNGSource(self.path)).image()
+
+        self.assertEqual(asset_cache.misses - misses, 1)
+
+    def test_scaled_by_pattern_matrix(self):
+        cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100))
+
+        PNGSource(self.path, w=80, h=60, filter=cairo.FILTER_FAST).set(cr, 10, 20, 100, 100)
+        pattern = cr.get_source()
+        self.assertEqual(pattern.get_surface().get_width(), 40)
+        self.assertEqual(pattern.get_matrix().as_tuple(), (0.5, 0, 0, 0.5, -5, -10))
+        self.assertEqual(pattern.get_filter(), cairo.FILTER_FAST)
+
+        with render_context(image_filter=cairo.FILTER_BEST):
+            PNGSource(self.path, filter=cairo.FILTER_FAST).set(cr, 0, 0, 80, 60)
+        self.assertEqual(cr.get_source().get_filter(), cairo.FILTER_BEST)
+
+    def test_bounded_lru(self):
+        cache = AssetCache(max_bytes=3 * 10 * 10 * 4)
+        surfaces = {}
+
+        def create(i):
+            from cairocffi import ImageSurface, FORMAT_ARGB32
+            surfaces[i] = ImageSurface(FORMAT_ARGB32, 10, 10)
+            return surfaces[i]
+
+        for i in range(3):
+            cache.get(i, lambda: create(i))
+        cache.get(0, lambda: create(0))
+        cache.get(3, lambda: create(3))
+
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(sorted(cache._entries), [0, 2, 3])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 4)
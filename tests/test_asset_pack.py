@@ -0,0 +1,63 @@
+import pickle
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import cairocffi as cairo
+from PIL import Image
+
+from bgfactory.components.asset_pack import AssetPack, compile_asset_pack
+from bgfactory.components.cairo_helpers import array_from_surface
+from bgfactory.components.source import PackSource
+
+
+class TestAssetPack(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.tmp_dir.name)
+
+        (root / 'assets' / 'icons').mkdir(parents=True)
+        Image.new('RGBA', (40, 20), (200, 10, 10, 255)).save(root / 'assets' / 'background.png')
+        Image.new('RGBA', (8, 8), (10, 200, 10, 128)).save(root / 'assets' / 'icons' / 'sword.png')
+        (root / 'assets' / 'readme.txt').write_text('not an image')
+
+        self.pack_path = root / 'assets.pack'
+        self.n = compile_asset_pack(root / 'assets', self.pack_path, levels=(2, 4))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pack(self):
+        pack = AssetPack(self.pack_path)
+
+        self.assertEqual(self.n, 2)
+        self.assertEqual(sorted(pack.names()), ['background.png', 'icons/sword.png'])
+        self.assertEqual(pack.get_size('background.png'), (40, 20))
+
+        pixels = array_from_surface(pack.get('background.png'))
+        self.assertEqual(tuple(pixels[5, 5]), (200, 10, 10, 255))
+        pixels = array_from_surface(pack.get('icons/sword.png'))
+        self.assertEqual(tuple(pixels[0, 0])[3], 128)
+
+        with self.assertRaises(KeyError):
+            pack.get('missing.png')
+
+    def test_levels(self):
+        pack = AssetPack(self.pack_path)
+
+        self.assertEqual(pack.get('background.png').get_width(), 40)
+        self.assertEqual(pack.get('background.png', 15, 8).get_width(), 20)
+        self.assertEqual(pack.get('background.png', 10, 5).get_width(), 10)
+        self.assertEqual(pack.get('background.png', 2, 2).get_width(), 10)
+        # the same surface is handed out again
+        self.assertIs(pack.get('background.png', 10, 5), pack.get('background.png', 10, 5))
+
+    def test_pack_source(self):
+        pack = pickle.loads(pickle.dumps(AssetPack(self.pack_path)))
+        cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 100))
+
+        PackSource(pack, 'background.png', w=20, h=10).set(cr, 0, 0, 100, 100)
+        pattern = cr.get_source()
+        self.assertEqual(pattern.get_surface().get_width(), 20)
+        self.assertEqual(pattern.get_matrix().as_tuple(), (1, 0, 0, 1, 0, 0))
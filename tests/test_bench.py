@@ -0,0 +1,44 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from bgfactory import bench
+
+
+class TestBench(TestCase):
+
+    def test_run_workload(self):
+        results = bench.run(['deep_infer'], repeat=1, isolate=False)
+
+        metrics = results['deep_infer']
+        self.assertEqual(metrics['items'], 20)
+        self.assertGreater(metrics['wall_time'], 0)
+
+    def test_compare(self):
+        baseline = {
+            'a': dict(wall_time=1.0, peak_rss=100, scale=1),
+            'b': dict(wall_time=1.0, peak_rss=100, scale=1),
+            'c': dict(wall_time=1.0, peak_rss=100, scale=2),
+        }
+        results = {
+            'a': dict(wall_time=1.05, peak_rss=90, scale=1),
+            'b': dict(wall_time=1.5, peak_rss=150, scale=1),
+            'c': dict(wall_time=5.0, peak_rss=100, scale=1),
+            'd': dict(wall_time=5.0, peak_rss=100, scale=1),
+        }
+
+        regressions = bench.compare(results, baseline, threshold=0.1)
+
+        self.assertEqual([(r['workload'], r['metric']) for r in regressions], [('b', 'wall_time'), ('b', 'peak_rss')])
+        self.assertAlmostEqual(regressions[0]['change'], 0.5)
+
+    def test_baseline_roundtrip(self):
+        results = {'a': dict(wall_time=1.0, peak_rss=None, scale=1)}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'baseline.json'
+            bench.save_baseline(results, path)
+            baseline = bench.load_baseline(path)
+
+        self.assertEqual(baseline['results'], results)
+        self.assertEqual(bench.compare(results, baseline), [])
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+import cairocffi as cairo
+import numpy as np
+
+from bgfactory.components.cairo_helpers import surface_to_array, array_from_surface, image_from_surface
+
+
+def _make_surface(rgba):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 4, 3)
+    cr = cairo.Context(surface)
+    cr.set_source_rgba(*rgba)
+    cr.paint()
+    return surface
+
+
+class TestCairoHelpers(TestCase):
+
+    def test_view_is_not_a_copy(self):
+        surface = _make_surface((1, 0, 0, 1))
+        view = surface_to_array(surface)
+
+        self.assertEqual(view.shape, (3, 4, 4))
+
+        view[0, 0] = 0
+        surface.mark_dirty()
+        self.assertEqual(bytes(surface.get_data())[:4], b'\0\0\0\0')
+
+    def test_unpremultiply(self):
+        surface = _make_surface((1, 0.5, 0, 0.5))
+
+        pixels = array_from_surface(surface)
+
+        self.assertEqual(pixels.shape, (3, 4, 4))
+        self.assertTrue(np.all(np.abs(pixels[0, 0].astype(int) - (255, 128, 0, 128)) <= 1))
+
+    def test_image_modes(self):
+        opaque = _make_surface((0, 0, 1, 1))
+
+        self.assertEqual(image_from_surface(opaque).getpixel((0, 0)), (0, 0, 255, 255))
+        self.assertEqual(image_from_surface(opaque, 'RGB').getpixel((0, 0)), (0, 0, 255))
+        self.assertEqual(image_from_surface(_make_surface((0, 0, 0, 0))).getpixel((0, 0)), (0, 0, 0, 0))
@@ -0,0 +1,110 @@
+import pickle
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from bgfactory.components.card_sheet import make_printable_sheets, CardRenderError, iter_printable_sheets, \
+    make_printable_pdf
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN, COLOR_BLUE
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextUniform, FontDescription
+
+
+class _FailingCard(Rectangle):
+
+    def _draw(self, cr, w, h):
+        raise RuntimeError('broken card')
+
+
+def _make_cards():
+    return [
+        Rectangle(0, 0, 150, 200, stroke_width=4, fill_src=color)
+        for color in (COLOR_RED, COLOR_GREEN, COLOR_BLUE) * 3
+    ]
+
+
+class TestCardSheet(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_components_are_picklable(self):
+        label = TextUniform(0, 0, 100, 30, 'Attack', FontDescription(size=20))
+        label.measure()
+
+        copy = pickle.loads(pickle.dumps(label))
+
+        self.assertEqual(copy.structural_hash(), label.structural_hash())
+        self.assertIsNotNone(copy.font_description.get_pango_font_description())
+
+    def test_jobs_match_serial(self):
+        make_printable_sheets(_make_cards(), dpi=100, out_dir_path=self.path / 'serial')
+        make_printable_sheets(_make_cards(), dpi=100, out_dir_path=self.path / 'jobs', jobs=2)
+
+        serial = sorted((self.path / 'serial').iterdir())
+        jobs = sorted((self.path / 'jobs').iterdir())
+        self.assertEqual([p.name for p in serial], [p.name for p in jobs])
+
+        for expected, actual in zip(serial, jobs):
+            expected = np.asarray(Image.open(expected), dtype=np.int16)
+            actual = np.asarray(Image.open(actual), dtype=np.int16)
+            self.assertLessEqual(np.abs(expected - actual).max(), 2)
+
+    def test_failing_card_is_reported(self):
+        cards = _make_cards()
+        cards[4] = _FailingCard(0, 0, 150, 200)
+
+        errors = []
+        make_printable_sheets(cards, dpi=100, out_dir_path=self.path, jobs=2, on_error=errors.append)
+
+        self.assertEqual([error.index for error in errors], [4])
+        self.assertIn('broken card', errors[0].message)
+        self.assertTrue((self.path / 'sheet00.png').exists())
+
+    def test_raised_error_depends_on_jobs(self):
+        cards = _make_cards()
+        cards[4] = _FailingCard(0, 0, 150, 200)
+
+        with self.assertRaises(RuntimeError):
+            make_printable_sheets(cards, dpi=100, out_dir_path=self.path)
+
+        with self.assertRaises(CardRenderError) as raised:
+            make_printable_sheets(cards, dpi=100, out_dir_path=self.path, jobs=2)
+        self.assertEqual(raised.exception.index, 4)
+        self.assertIn('RuntimeError: broken card', raised.exception.message)
+
+    def test_jobs_accept_iterables(self):
+        sheets = make_printable_sheets((card for card in _make_cards()), dpi=100, out_dir_path=self.path, jobs=2)
+
+        self.assertEqual(sorted(p.name for p in self.path.iterdir()), [f'sheet{i:02d}.png' for i in range(len(sheets))])
+
+        with self.assertRaises(ValueError):
+            make_printable_sheets(_make_cards(), dpi=100, jobs=2)
+        with self.assertRaises(ValueError):
+            make_printable_sheets(_make_cards(), dpi=100, on_error='report')
+
+    def test_iter_printable_sheets(self):
+        expected = make_printable_sheets(_make_cards(), dpi=100)
+
+        sheets = list(iter_printable_sheets((card for card in _make_cards()), dpi=100, out_dir_path=self.path))
+
+        self.assertEqual(len(sheets), len(expected))
+        self.assertEqual([(s.w, s.h) for s in sheets], [(s.w, s.h) for s in expected])
+        self.assertEqual(sorted(p.name for p in self.path.iterdir()), [f'sheet{i:02d}.png' for i in range(len(expected))])
+
+    def test_make_printable_pdf(self):
+        path = self.path / 'deck.pdf'
+        expected = make_printable_sheets(_make_cards(), dpi=100)
+
+        pages = make_printable_pdf(_make_cards(), path, dpi=100)
+
+        self.assertEqual(pages, len(expected))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(5), b'%PDF-')
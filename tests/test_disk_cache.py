@@ -0,0 +1,81 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import cairocffi as cairo
+import numpy as np
+
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN
+from bgfactory.components.disk_cache import DiskCache
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Circle
+
+
+class TestDiskCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_roundtrip(self):
+        cache = DiskCache(self.tmp_dir.name)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 30, 20)
+        cr = cairo.Context(surface)
+        cr.set_source_rgba(0.2, 0.4, 0.6, 0.5)
+        cr.paint()
+
+        cache.put(('hash', 30, 20), surface)
+        loaded = cache.get(('hash', 30, 20))
+
+        self.assertEqual((loaded.get_width(), loaded.get_height()), (30, 20))
+        self.assertEqual(bytes(loaded.get_data()), bytes(surface.get_data()))
+        self.assertIsNone(cache.get(('hash', 31, 20)))
+        self.assertEqual((cache.hits, cache.misses, cache.writes), (1, 1, 1))
+
+    def test_garbage_collection(self):
+        cache = DiskCache(self.tmp_dir.name)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 10)
+        for i in range(5):
+            cache.put(('hash', i), surface)
+            # make the access order explicit, the writes can share the same mtime
+            os.utime(cache._entry_path(('hash', i)), (i, i))
+
+        entry_size = cache.stats()['bytes'] // 5
+        removed = cache.collect_garbage(max_bytes=entry_size * 2)
+
+        self.assertEqual(removed, 3)
+        self.assertEqual(cache.stats()['bytes'], entry_size * 2)
+        self.assertIsNone(cache.get(('hash', 2)))
+        self.assertIsNotNone(cache.get(('hash', 3)))
+
+    def test_image_is_loaded_from_cache(self):
+        cache = DiskCache(self.tmp_dir.name)
+
+        def make_component():
+            return Circle(0, 0, 40, stroke_width=4, stroke_src=COLOR_RED, fill_src=COLOR_GREEN)
+
+        with render_context(disk_cache=cache):
+            first = np.asarray(make_component().image())
+            second = np.asarray(make_component().image())
+
+        self.assertEqual((cache.hits, cache.writes), (1, 1))
+        self.assertTrue(np.array_equal(first, second))
+
+    def test_render_options_are_part_of_the_key(self):
+        cache = DiskCache(self.tmp_dir.name)
+
+        def make_component():
+            return Circle(0, 0, 40, stroke_width=4, stroke_src=COLOR_RED, fill_src=COLOR_GREEN)
+
+        with render_context(disk_cache=cache, tolerance=0.1):
+            make_component().image()
+        with render_context(disk_cache=cache, tolerance=1):
+            make_component().image()
+        with render_context(disk_cache=cache, tolerance=1, image_filter=cairo.FILTER_FAST):
+            make_component().image()
+
+        self.assertEqual((cache.hits, cache.writes), (0, 3))
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+from bgfactory import ff
+
+
+class TestFF(TestCase):
+
+    def test_import_is_lazy(self):
+        code = ('import sys; from bgfactory import ff; '
+                'print(" ".join(m for m in ("cairocffi", "pangocffi", "numpy", "PIL") if m in sys.modules))')
+        loaded = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+
+        self.assertEqual(loaded.strip(), '')
+
+    def test_exports(self):
+        from bgfactory.components.shape import Rectangle
+
+        self.assertIs(ff.Rectangle, Rectangle)
+        self.assertEqual(ff.INFER, 'infer')
+        for name in ff.__all__:
+            self.assertTrue(hasattr(ff, name), name)
+
+        with self.assertRaises(AttributeError):
+            ff.NotAComponent
@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from bgfactory.components.constants import INFER
+from bgfactory.components.raster_cache import RasterCache
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextMarkup, _find_replacements
+
+
+class TestGlyphReplacement(TestCase):
+
+    def test_find_replacements(self):
+        markup = 'Deal 2 <b>&amp;</b> to an @@ and gain &amp;@'
+
+        matches = _find_replacements(markup, ('&', '@', '@@'))
+
+        self.assertEqual(matches, ((7, 8, '&'), (15, 17, '@@'), (27, 28, '&'), (28, 29, '@')))
+        self.assertIs(_find_replacements(markup, ('&', '@', '@@')), matches)
+        self.assertEqual(_find_replacements(markup, ()), ())
+
+    def test_glyph_surfaces_cached(self):
+        icon = Rectangle(0, 0, 12, 12, stroke_width=1, fill_src=(1, 0, 0, 0.5))
+        text = TextMarkup(0, 0, 300, INFER, 'Gain &amp; &amp; &amp; and &amp; &amp; &amp;',
+                          text_replace_map={'&': icon})
+        card = Rectangle(0, 0, 320, 200)
+        card.add(text)
+
+        # the text itself is seen only once, so only the glyphs are cached
+        cache = RasterCache()
+        with render_context(raster_cache=cache):
+            card.image()
+
+        glyphs = [key for key in cache._entries if key[0] == 'glyph']
+        self.assertGreaterEqual(len(glyphs), 1)
+        self.assertLess(len(glyphs), 6)
+        self.assertGreater(cache.hits, 0)
@@ -0,0 +1,65 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import cairocffi as cairo
+import numpy as np
+from PIL import Image
+
+from bgfactory.components.asset_cache import asset_cache
+from bgfactory.components.cairo_helpers import array_from_surface, surface_from_image
+from bgfactory.components.source import AUTO, ImageSource, _draft_reduce
+
+
+class TestImageSource(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        asset_cache.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _save(self, name, size, color=(200, 10, 10)):
+        path = Path(self.tmp_dir.name) / name
+        Image.new('RGB', size, color).save(path)
+        return path
+
+    def test_draft_reduce(self):
+        self.assertEqual(_draft_reduce(4000, 6000, 750, 1050), 4)
+        self.assertEqual(_draft_reduce(4000, 6000, 300, 300), 8)
+        self.assertEqual(_draft_reduce(4000, 6000, 2500, 1000), 1)
+
+    def test_jpeg_decoded_reduced(self):
+        path = self._save('art.jpg', (800, 600))
+        cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 200, 150))
+
+        ImageSource(path).set(cr, 0, 0, 200, 150)
+        pattern = cr.get_source()
+        self.assertEqual(pattern.get_surface().get_width(), 200)
+        self.assertEqual(pattern.get_surface().get_height(), 150)
+
+        # the target size is computed from the size of the original image
+        ImageSource(path, w=100, h=AUTO).set(cr, 0, 0, 200, 150)
+        self.assertEqual(cr.get_source().get_matrix().as_tuple()[:4], (1, 0, 0, 1))
+
+    def test_other_formats(self):
+        for name in ['art.webp', 'art.tiff', 'art.png']:
+            path = self._save(name, (80, 60))
+            cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 20, 15))
+
+            ImageSource(path).set(cr, 0, 0, 20, 15)
+            # only JPEG is decoded at a reduced size
+            self.assertEqual(cr.get_source().get_surface().get_width(), 80)
+
+    def test_surface_from_image(self):
+        image = Image.new('RGBA', (3, 2), (200, 100, 50, 128))
+        image.putpixel((0, 0), (10, 20, 30, 0))
+        image.putpixel((1, 0), (10, 20, 30, 255))
+
+        surface = surface_from_image(image)
+        pixels = array_from_surface(surface)
+
+        self.assertEqual(tuple(pixels[0, 0]), (0, 0, 0, 0))
+        self.assertEqual(tuple(pixels[0, 1]), (10, 20, 30, 255))
+        self.assertTrue(np.all(np.abs(pixels[1].astype(int) - (200, 100, 50, 128)) <= 1))
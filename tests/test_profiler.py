@@ -0,0 +1,53 @@
+import threading
+import time
+from unittest import TestCase
+
+from bgfactory.common.profiler import Profiler
+
+
+class TestProfiler(TestCase):
+
+    def test_disabled_records_nothing(self):
+        profiler = Profiler()
+
+        @profiler.profiled()
+        def work():
+            with profiler.section('inner'):
+                pass
+
+        work()
+        self.assertEqual(profiler.summary(), [])
+
+    def test_nested_self_time(self):
+        profiler = Profiler(enabled=True)
+
+        with profiler.section('outer'):
+            time.sleep(0.02)
+            with profiler.section('inner'):
+                time.sleep(0.05)
+
+        rows = {row['name']: row for row in profiler.summary()}
+        self.assertGreaterEqual(rows['outer']['total'], rows['inner']['total'])
+        self.assertLess(rows['outer']['self'], rows['inner']['self'])
+        self.assertAlmostEqual(rows['outer']['self'] + rows['inner']['self'], rows['outer']['total'], places=6)
+
+    def test_threads_and_chrome_trace(self):
+        profiler = Profiler(enabled=True)
+        # keep the threads alive together, so that their idents are distinct
+        barrier = threading.Barrier(4)
+
+        def work():
+            with profiler.section('outer'):
+                with profiler.section('inner'):
+                    barrier.wait()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        trace = profiler.chrome_trace()
+        self.assertEqual(len(trace['traceEvents']), 8)
+        self.assertEqual(len({event['tid'] for event in trace['traceEvents']}), 4)
+        self.assertEqual({row['name']: row['count'] for row in profiler.summary()}, {'outer': 4, 'inner': 4})
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import numpy as np
+
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN, HALIGN_CENTER, VALIGN_MIDDLE
+from bgfactory.components.layout.horizontal_flow_layout import HorizontalFlowLayout
+from bgfactory.components.raster_cache import RasterCache
+from bgfactory.components.regular_polygon import RegularPolygon
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextUniform, FontDescription
+
+
+class _FakeSurface:
+
+    def __init__(self, w, h):
+        self.w = w
+        self.h = h
+
+    def get_stride(self):
+        return self.w * 4
+
+    def get_height(self):
+        return self.h
+
+
+def _make_board(n):
+    board = Rectangle(0, 0, 60 * n, 100, stroke_width=0, layout=HorizontalFlowLayout(HALIGN_CENTER, VALIGN_MIDDLE))
+    for i in range(n):
+        board.add(RegularPolygon(0, 0, 25, 6, stroke_width=2, stroke_src=COLOR_RED, fill_src=COLOR_GREEN))
+    return board
+
+
+class TestRasterCache(TestCase):
+
+    def test_lru_is_bounded_by_bytes(self):
+        cache = RasterCache(max_bytes=3 * 400, min_uses=1)
+
+        for i in range(4):
+            cache.put(('key', i), _FakeSurface(10, 10))
+
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.bytes, 3 * 400)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNone(cache.get(('key', 0)))
+        self.assertIsNotNone(cache.get(('key', 3)))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_store_after_min_uses(self):
+        cache = RasterCache(min_uses=3)
+
+        self.assertFalse(cache.should_store('key'))
+        self.assertFalse(cache.should_store('key'))
+        self.assertTrue(cache.should_store('key'))
+
+    def test_structural_hash(self):
+        font = FontDescription(size=20)
+        label1 = TextUniform(0, 0, 100, 30, 'Attack', font)
+        label2 = TextUniform(10, 20, 100, 30, 'Attack', FontDescription(size=20))
+        label3 = TextUniform(0, 0, 100, 30, 'Defense', font)
+
+        self.assertEqual(label1.structural_hash(), label2.structural_hash())
+        self.assertNotEqual(label1.structural_hash(), label3.structural_hash())
+
+        self.assertEqual(_make_board(3).structural_hash(), _make_board(3).structural_hash())
+        self.assertNotEqual(_make_board(3).structural_hash(), _make_board(4).structural_hash())
+
+    def test_cached_render_matches(self):
+        board = _make_board(8)
+        expected = np.asarray(board.image(), dtype=np.int16)
+
+        cache = RasterCache()
+        with render_context(raster_cache=cache):
+            actual = np.asarray(board.image(), dtype=np.int16)
+
+        self.assertGreater(cache.hits, 0)
+        self.assertLessEqual(np.abs(expected - actual).max(), 2)
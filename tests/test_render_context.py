@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from bgfactory.components.constants import INFER
+from bgfactory.components.layout.layout_manager import LayoutManager
+from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Rectangle
+
+
+class TestRenderContext(TestCase):
+
+    def test_change_invalidates_the_measuring_render(self):
+        container = Rectangle(0, 0, INFER, INFER, stroke_width=0, layout=VerticalFlowLayout())
+        child = Rectangle(0, 0, 20, 30, stroke_width=0)
+        container.add(child)
+
+        with render_context() as context:
+            self.assertEqual(container.measure(), (20, 30))
+            token = context.token()
+
+            # components built meanwhile (e.g. in another thread) don't take part in the render
+            Rectangle(0, 0, 10, 10).add(Rectangle(0, 0, 5, 5))
+            self.assertEqual(context.token(), token)
+
+            child.h = 40
+            self.assertNotEqual(context.token(), token)
+            self.assertEqual(container.measure(), (20, 40))
+
+    def test_nested_contexts_share_the_generation(self):
+        child = Rectangle(0, 0, 20, 30, stroke_width=0)
+
+        with render_context() as outer:
+            with render_context(tolerance=1):
+                child.measure()
+            token = outer.token()
+
+            child.w = 25
+            self.assertNotEqual(outer.token(), token)
+
+    def test_arrange_required(self):
+        class Layout(LayoutManager):
+
+            def get_size(self):
+                return 0, 0
+
+            def validate_child(self, child):
+                pass
+
+        with self.assertRaises(TypeError):
+            Layout()
@@ -0,0 +1,70 @@
+import gc
+import json
+import weakref
+from unittest import TestCase
+
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN, HALIGN_CENTER, VALIGN_MIDDLE
+from bgfactory.components.layout.horizontal_flow_layout import HorizontalFlowLayout
+from bgfactory.components.regular_polygon import RegularPolygon
+from bgfactory.components.render_context import render_context
+from bgfactory.components.render_report import RenderReport
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextUniform
+
+
+class TestRenderReport(TestCase):
+
+    def test_report(self):
+        board = Rectangle(0, 0, 200, 100, stroke_width=2, layout=HorizontalFlowLayout(HALIGN_CENTER, VALIGN_MIDDLE))
+        for i in range(3):
+            board.add(RegularPolygon(0, 0, 25, 6, stroke_width=2, stroke_src=COLOR_RED, fill_src=COLOR_GREEN))
+
+        report = RenderReport()
+        with render_context(report=report):
+            board.image()
+
+        result = json.loads(report.to_json())
+        nodes = {node['path']: node for node in result['nodes']}
+
+        self.assertEqual(nodes['Rectangle[0]']['draw_calls'], 1)
+        self.assertEqual(nodes['Rectangle[0]']['surface_bytes'], 200 * 4 * 100)
+        for i in range(3):
+            node = nodes[f'Rectangle[0]/RegularPolygon[{i}]']
+            self.assertEqual(node['draw_calls'], 1)
+            self.assertGreaterEqual(node['get_size_calls'], 1)
+            # the times are converted from nanoseconds separately, allow for the rounding
+            self.assertLessEqual(node['self_time'], node['draw_time'] + node['get_size_time'] + 1e-9)
+
+        self.assertEqual(result['classes']['RegularPolygon']['nodes'], 3)
+        self.assertEqual(result['classes']['RegularPolygon']['draw_calls'], 3)
+        self.assertGreaterEqual(result['peak_surface_bytes'], 200 * 4 * 100)
+
+    def test_components_not_kept(self):
+        board = Rectangle(0, 0, 200, 100, stroke_width=2)
+        board.add(RegularPolygon(0, 0, 25, 6))
+
+        report = RenderReport()
+        with render_context(report=report):
+            board.image()
+
+        ref = weakref.ref(board)
+        del board
+        gc.collect()
+
+        self.assertIsNone(ref())
+        self.assertEqual(report._paths, {})
+        paths = [node['path'] for node in report.to_dict()['nodes']]
+        self.assertEqual(paths, ['Rectangle[0]', 'Rectangle[0]/RegularPolygon[0]'])
+
+    def test_groups_counted(self):
+        text = TextUniform(0, 0, 200, 100, 'Fireball', stroke_width=2, stroke_src=COLOR_RED)
+
+        report = RenderReport()
+        with render_context(report=report):
+            text.image()
+
+        node = {node['path']: node for node in report.to_dict()['nodes']}['TextUniform[0]']
+        # the surface of the text and the group isolating its outline
+        self.assertEqual(node['surface_count'], 2)
+        self.assertEqual(report.peak_surface_bytes, 2 * 200 * 4 * 100)
+        self.assertEqual(report._groups(), [])
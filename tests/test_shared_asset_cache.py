@@ -0,0 +1,85 @@
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from unittest import TestCase
+
+from PIL import Image
+
+from bgfactory.components.cairo_helpers import array_from_surface, surface_from_image
+from bgfactory.components.render_context import render_context
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.shared_asset_cache import SharedAssetCache
+from bgfactory.components.source import PNGSource
+
+
+def _create():
+    return surface_from_image(Image.new('RGBA', (6, 4), (200, 10, 10, 255)))
+
+
+def _fail():
+    raise AssertionError('the surface should be mapped from the shared memory')
+
+
+def _read_pixel(cache):
+    surface = cache.get('background', _fail)
+    return tuple(int(c) for c in array_from_surface(surface)[1, 1])
+
+
+class TestSharedAssetCache(TestCase):
+
+    def test_shared_between_processes(self):
+        with SharedAssetCache() as cache:
+            surface = cache.get('background', _create)
+            self.assertEqual((surface.get_width(), surface.get_height()), (6, 4))
+            self.assertIs(cache.get('background', _fail), surface)
+
+            with ProcessPoolExecutor(2) as pool:
+                pixels = list(pool.map(_read_pixel, [cache] * 4))
+
+            self.assertEqual(pixels, [(200, 10, 10, 255)] * 4)
+
+    def test_segments_outlive_the_workers(self):
+        with SharedAssetCache() as cache:
+            cache.get('background', _create)
+            name = cache._segment_name('background')
+
+            with ProcessPoolExecutor(2) as pool:
+                list(pool.map(_read_pixel, [cache] * 4))
+
+            # the workers only unmapped the segment when they exited
+            shared_memory.SharedMemory(name).close()
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+    def test_unpickled_in_the_same_process(self):
+        with SharedAssetCache() as cache:
+            self.assertIs(pickle.loads(pickle.dumps(cache)), cache)
+
+    def test_segments_unlinked_on_last_release(self):
+        cache = SharedAssetCache().acquire()
+        cache.acquire()
+        cache.get('background', _create)
+        name = cache._segment_name('background')
+
+        cache.release()
+        shared_memory.SharedMemory(name).close()
+
+        cache.release()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+    def test_render_option(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'background.png'
+            Image.new('RGBA', (40, 30), (200, 10, 10, 255)).save(path)
+
+            with SharedAssetCache() as cache:
+                for _ in range(3):
+                    with render_context(asset_cache=cache):
+                        Rectangle(0, 0, 80, 60, fill_src=PNGSource(path)).image()
+
+                self.assertEqual(cache.stats()['misses'], 1)
+                self.assertEqual(cache.stats()['hits'], 2)
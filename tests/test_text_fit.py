@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from bgfactory.components.constants import FIT_SHRINK, INFER
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextUniform, TextMarkup, FontDescription
+from bgfactory.components.text_layout_cache import text_layout_cache
+
+
+LONG_TEXT = 'Warlocks are powerful users of magic. It is ancient and its origins are so old that they were long ' \
+            'forgotten. Despite their power, Warlocks are typically cheerful people.'
+
+
+class TestTextFit(TestCase):
+
+    def test_shrink(self):
+        for cls in (TextUniform, TextMarkup):
+            text = cls(0, 0, 200, 100, LONG_TEXT, font_description=FontDescription(size=40), fit=FIT_SHRINK,
+                       fit_min_size=6)
+
+            size = text._get_fit_size(200, 100)
+            self.assertLess(size, 40)
+            self.assertGreaterEqual(size, 6)
+
+            _, _, _, th = text._get_text_size(200, 100, size)
+            self.assertLessEqual(th, 100)
+            _, _, _, th = text._get_text_size(200, 100, size + 0.5)
+            self.assertGreater(th, 100)
+
+    def test_short_text_keeps_size(self):
+        text = TextUniform(0, 0, 200, 100, 'Imp', font_description=FontDescription(size=20), fit=FIT_SHRINK)
+        self.assertEqual(text._get_fit_size(200, 100), 20)
+
+        text = TextUniform(0, 0, 200, 100, 'Imp', font_description=FontDescription(size=20), fit=FIT_SHRINK,
+                           fit_max_size=30)
+        self.assertEqual(text._get_fit_size(200, 100), 30)
+
+    def test_inferred_height_is_not_fitted(self):
+        text = TextUniform(0, 0, 200, INFER, LONG_TEXT, font_description=FontDescription(size=40), fit=FIT_SHRINK)
+        reference = TextUniform(0, 0, 200, INFER, LONG_TEXT, font_description=FontDescription(size=40))
+        self.assertEqual(text.measure(), reference.measure())
+
+    def test_layouts_reused_across_cards(self):
+        text_layout_cache.clear()
+        misses = text_layout_cache.misses
+
+        for _ in range(20):
+            card = Rectangle(0, 0, 250, 150)
+            card.add(TextUniform(10, 10, 200, 100, LONG_TEXT, font_description=FontDescription(size=40),
+                                 fit=FIT_SHRINK))
+            card.image()
+
+        # the sizes tried by the search are laid out only for the first card
+        self.assertLessEqual(text_layout_cache.misses - misses, 10)
+
+    def test_invalid_fit(self):
+        with self.assertRaises(ValueError):
+            TextUniform(0, 0, 200, 100, 'Imp', fit='grow')
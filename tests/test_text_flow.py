@@ -0,0 +1,47 @@
+import pickle
+from unittest import TestCase
+
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import FontDescription
+from bgfactory.components.text_flow import TextFlow
+
+
+RULES = ' '.join(f'<b>Rule {i}.</b> Every player draws a card &amp; discards one.' for i in range(60))
+
+
+class TestTextFlow(TestCase):
+
+    def test_frames_cover_all_lines(self):
+        flow = TextFlow(RULES, 300, font_description=FontDescription(size=20))
+        lines = flow._get_lines()
+
+        frames = list(flow.frames(200))
+
+        self.assertTrue(flow.finished)
+        self.assertIsNone(flow.next_frame(200))
+        self.assertGreater(len(frames), 1)
+        self.assertEqual(frames[0].start_line, 0)
+        self.assertEqual(frames[-1].end_line, len(lines))
+        for previous, frame in zip(frames, frames[1:]):
+            self.assertEqual(previous.end_line, frame.start_line)
+        for frame in frames:
+            self.assertLessEqual(lines[frame.end_line - 1][1] - lines[frame.start_line][0], 200)
+
+    def test_chain_of_frames(self):
+        flow = TextFlow(RULES, 300, font_description=FontDescription(size=20))
+
+        page = Rectangle(0, 0, 700, 500)
+        page.add(flow.next_frame(460, x=20, y=20), flow.next_frame(460, x=360, y=20))
+        page.image()
+
+        self.assertEqual(page.children[1].start_line, page.children[0].end_line)
+        self.assertFalse(flow.finished)
+
+    def test_pickle(self):
+        flow = TextFlow(RULES, 300, font_description=FontDescription(size=20))
+        frame = flow.next_frame(200)
+
+        copy = pickle.loads(pickle.dumps(frame))
+
+        self.assertEqual(copy.structural_hash(), frame.structural_hash())
+        copy.image()
@@ -0,0 +1,64 @@
+from unittest import TestCase, mock
+
+import cairocffi as cairo
+import pangocairocffi as pc
+
+from bgfactory.components.constants import INFER
+from bgfactory.components.text import TextUniform, TextMarkup, FontDescription
+from bgfactory.components.text_layout_cache import text_layout_cache, TextLayoutCache
+
+
+class TestTextLayoutCache(TestCase):
+
+    def setUp(self):
+        text_layout_cache.clear()
+
+    def test_shared_between_components(self):
+        misses = text_layout_cache.misses
+
+        sizes = [TextUniform(0, 0, 200, INFER, 'Fireball', font_description=FontDescription(size=20)).measure()
+                 for _ in range(10)]
+
+        self.assertEqual(text_layout_cache.misses - misses, 1)
+        self.assertEqual(len(set(sizes)), 1)
+
+        TextUniform(0, 0, 200, INFER, 'Fireball', font_description=FontDescription(size=21)).measure()
+        TextUniform(0, 0, 150, INFER, 'Fireball', font_description=FontDescription(size=20)).measure()
+        TextMarkup(0, 0, 200, INFER, 'Fireball', font_description=FontDescription(size=20)).measure()
+        self.assertEqual(text_layout_cache.misses - misses, 4)
+
+    def test_bounded(self):
+        cache = TextLayoutCache(max_entries=2)
+        text = TextUniform(0, 0, 200, INFER, 'Fireball')
+
+        for i in range(5):
+            cache.get(i, lambda layout: text._setup_pc_layout(layout, 200))
+        cache.get(4, lambda layout: text._setup_pc_layout(layout, 200))
+
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.misses, 5)
+        self.assertEqual(cache.hits, 1)
+
+    def test_not_updated_for_drawing(self):
+        text = TextUniform(0, 0, 200, INFER, 'Fireball', font_description=FontDescription(size=20))
+        w, h = text.measure()
+        _, extents = text._get_layout(w)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 600, 300)
+        cr = cairo.Context(surface)
+        cr.scale(3, 3)
+        with mock.patch.object(pc, 'update_layout', side_effect=AssertionError), \
+                mock.patch.object(pc, 'update_context', side_effect=AssertionError):
+            text.draw_into(cr, 0, 0, w, h)
+
+        hits = text_layout_cache.hits
+        self.assertEqual(text._get_layout(w)[1], extents)
+        self.assertEqual(text_layout_cache.hits - hits, 1)
+
+    def test_font_descriptions_interned(self):
+        a = FontDescription(family='Arial', size=20).get_pango_font_description()
+        b = FontDescription(family='Arial', size=20).get_pango_font_description()
+        c = FontDescription(family='Arial', size=21).get_pango_font_description()
+
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import numpy as np
+
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN, HALIGN_CENTER, VALIGN_MIDDLE
+from bgfactory.components.layout.horizontal_flow_layout import HorizontalFlowLayout
+from bgfactory.components.regular_polygon import RegularPolygon
+from bgfactory.components.render_context import render_context
+from bgfactory.components.render_report import RenderReport
+from bgfactory.components.shape import Rectangle
+from bgfactory.components.text import TextUniform, FontDescription
+
+
+def _make_board():
+    board = Rectangle(0, 0, 415.5, 120, stroke_width=3, layout=HorizontalFlowLayout(HALIGN_CENTER, VALIGN_MIDDLE))
+    for i in range(6):
+        polygon = RegularPolygon(0, 0, 30.25, 6, stroke_width=2, stroke_src=COLOR_RED, fill_src=(0, 1, 0, 0.5))
+        polygon.add(TextUniform(0, 0, 40, 30, str(i), FontDescription(size=20), fill_src=COLOR_GREEN))
+        board.add(polygon)
+    return board
+
+
+class TestThreadedRender(TestCase):
+
+    def test_matches_serial(self):
+        expected = np.asarray(_make_board().image(), dtype=np.int16)
+
+        with ThreadPoolExecutor(4) as pool, render_context(thread_pool=pool):
+            actual = np.asarray(_make_board().image(), dtype=np.int16)
+
+        self.assertEqual(expected.shape, actual.shape)
+        self.assertLessEqual(np.abs(expected - actual).max(), 2)
+
+    def test_report_charges_children(self):
+        report = RenderReport()
+        with ThreadPoolExecutor(4) as pool, render_context(thread_pool=pool, report=report):
+            _make_board().image()
+
+        nodes = {node['path']: node for node in report.to_dict()['nodes']}
+        self.assertNotIn('', nodes)
+        for i in range(6):
+            node = nodes[f'Rectangle[0]/RegularPolygon[{i}]']
+            self.assertEqual(node['draw_calls'], 1)
+            self.assertEqual(node['surface_count'], 1)
+            self.assertGreater(node['surface_bytes'], 0)
@@ -0,0 +1,54 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from bgfactory.components.constants import COLOR_RED, COLOR_GREEN, HALIGN_CENTER, VALIGN_MIDDLE
+from bgfactory.components.layout.vertical_flow_layout import VerticalFlowLayout
+from bgfactory.components.shape import Rectangle, Circle
+from bgfactory.components.tiled_render import render_tiled
+
+
+def _make_board():
+    board = Rectangle(0, 0, 150, 530, stroke_width=5, layout=VerticalFlowLayout(HALIGN_CENTER, VALIGN_MIDDLE))
+    for i in range(5):
+        board.add(Circle(0, 0, 45, stroke_width=3, stroke_src=COLOR_RED, fill_src=(0, 0.5, 0, 0.5)))
+    board.add(Rectangle(0, 0, 100, 20, fill_src=COLOR_GREEN))
+    return board
+
+
+class TestTiledRender(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_formats_match_image(self):
+        board = _make_board()
+        expected = np.asarray(board.image())
+
+        for name in ('board.png', 'board.tiff'):
+            size = render_tiled(board, self.path / name, strip_height=64, dpi=300)
+
+            actual = np.asarray(Image.open(self.path / name))
+            self.assertEqual(size, (150, 530))
+            self.assertLessEqual(np.abs(expected.astype(int) - actual).max(), 2, name)
+
+        render_tiled(board, self.path / 'board.raw', strip_height=100)
+        actual = np.fromfile(self.path / 'board.raw', dtype=np.uint8).reshape(expected.shape)
+        self.assertLessEqual(np.abs(expected.astype(int) - actual).max(), 2)
+
+    def test_rgb(self):
+        board = _make_board()
+        expected = np.asarray(board.image().convert('RGB'))
+
+        render_tiled(board, self.path / 'board.png', mode='RGB', strip_height=50)
+
+        actual = Image.open(self.path / 'board.png')
+        self.assertEqual(actual.mode, 'RGB')
+        self.assertLessEqual(np.abs(expected.astype(int) - np.asarray(actual)).max(), 2)